@@ -35,6 +35,7 @@ class ApiKeyDialog(QtWidgets.QDialog):
     
 
 class LoadingDialog(QtWidgets.QDialog):
+    canceled = QtCore.pyqtSignal()
     def __init__(self, message="Loading...", parent=None):
         super().__init__(parent)
         self.setWindowTitle("Please Wait")
@@ -45,8 +46,65 @@ class LoadingDialog(QtWidgets.QDialog):
             QtCore.Qt.WindowTitleHint 
         )
         layout = QtWidgets.QVBoxLayout(self)
-        label = QtWidgets.QLabel(message)
-        label.setAlignment(QtCore.Qt.AlignCenter)
-        layout.addWidget(label)
+        self.label = QtWidgets.QLabel(message)
+        self.label.setAlignment(QtCore.Qt.AlignCenter)
+        layout.addWidget(self.label)
+
+        self.progress_bar = QtWidgets.QProgressBar()
+        self.progress_bar.setTextVisible(True)
+        self.progress_bar.setVisible(False)
+        layout.addWidget(self.progress_bar)
+
+        self.btn_cancel = QtWidgets.QPushButton("Cancel")
+        self.btn_cancel.setVisible(False)
+        self.btn_cancel.clicked.connect(self.reject)
+        layout.addWidget(self.btn_cancel)
+
+        self.__on_cancel = None
+        self.rejected.connect(self.__on_rejected)
         self.setFixedSize(250, 100)
-        
\ No newline at end of file
+
+    def reset(self, message="Loading...", cancelable=False, on_cancel=None):
+        """
+        Restore the dialog to its initial state before reusing it for a new task.
+
+        :param message: Text shown above the progress bar.
+        :type message: str
+        :param cancelable: Whether the user can abort the task.
+        :type cancelable: bool
+        :param on_cancel: Called if the user aborts this task; dropped once the
+            dialog is accepted or reset for another task.
+        :type on_cancel: callable
+        """
+        self.__on_cancel = on_cancel
+        cancelable = cancelable or on_cancel is not None
+        self.label.setText(message)
+        self.progress_bar.setVisible(False)
+        self.progress_bar.setRange(0, 0)
+        self.btn_cancel.setVisible(cancelable)
+        self.setFixedSize(250, 140 if cancelable else 100)
+
+    def accept(self):
+        self.__on_cancel = None
+        super().accept()
+
+    def __on_rejected(self):
+        on_cancel, self.__on_cancel = self.__on_cancel, None
+        if on_cancel is not None:
+            on_cancel()
+        self.canceled.emit()
+
+    @QtCore.pyqtSlot(int, int)
+    def set_progress(self, value, maximum):
+        """
+        Show the progress bar and update its value.
+
+        :param value: Completed steps.
+        :type value: int
+        :param maximum: Total steps, or 0 for a busy indicator.
+        :type maximum: int
+        """
+        if not self.progress_bar.isVisible():
+            self.progress_bar.setVisible(True)
+        self.progress_bar.setRange(0, maximum)
+        self.progress_bar.setValue(value)
@@ -1,8 +1,7 @@
 import os
+import logging
+logger = logging.getLogger(__name__)
 
-from svglib import svglib
-
-from reportlab.pdfbase.ttfonts import TTFont, TTFError
 from reportlab.lib import colors
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfgen import canvas
@@ -11,16 +10,35 @@ from reportlab.platypus import Paragraph, Table, Image
 from reportlab.lib.styles import ParagraphStyle
 from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_RIGHT
 
+from app.models.template import TemplateDocument
+from app.io.render_tree import build_render_list
+from app.io.fonts import font_registry
+from app.io.svg_cache import svg_drawings
+from app.io.image_prep import ImagePreparer, DEFAULT_DPI, DEFAULT_JPEG_QUALITY
+
+
+class ExportCanceled(Exception):
+    """
+    Raised by a progress callback to abort an export.
+    """
+
 
 class ReporteClaseBase(canvas.Canvas):
     """
     Clase base para cada slide del reporte
     """
 
-    def __init__(self, filename, pagesize=(1000, 1000)):
+    def __init__(self, filename, pagesize=(1000, 1000), image_dpi=DEFAULT_DPI, jpeg_quality=DEFAULT_JPEG_QUALITY,
+                 image_preparer=None):
         """
         :param pagesize: dimensiones del reporte
         :type pagesize: tuple.
+        :param image_dpi: resolución de las imágenes embebidas (None para embeber los originales).
+        :type image_dpi: int
+        :param jpeg_quality: calidad JPEG de las fotos embebidas.
+        :type jpeg_quality: int
+        :param image_preparer: preparador compartido con otros documentos (ignora image_dpi y jpeg_quality).
+        :type image_preparer: ImagePreparer
         """
         super(ReporteClaseBase, self).__init__(
             filename=filename,
@@ -39,22 +57,27 @@ class ReporteClaseBase(canvas.Canvas):
         self._path_fonts = os.path.join(path_assets, "fonts")
         self._path_imgs = os.path.join(path_assets, "images/reporte")
 
-        try:
-            pdfmetrics.registerFont(TTFont(
-                "OpenSans-Regular",
-                os.path.join(self._path_fonts, "OpenSans_Condensed-Regular.ttf")
-            ))
-            self._default_font = "OpenSans-Regular"
-
-            pdfmetrics.registerFont(TTFont(
-                "OpenSans-Bold",
-                os.path.join(self._path_fonts, "OpenSans_Condensed-Bold.ttf")
-            ))
-            self._default_font_black = "OpenSans-Bold"
-        except TTFError:
-            self._default_font = "Times-Roman"
-            self._default_font_black = self._default_font
         self._size = pagesize
+        self.__svg_forms = dict()
+        if image_preparer is None:
+            image_preparer = ImagePreparer(image_dpi, jpeg_quality)
+        self.image_preparer = image_preparer
+
+    @property
+    def _default_font(self):
+        """
+        Fuente por defecto. Las fuentes se registran una sola vez por proceso,
+        la primera vez que se usan.
+        """
+        if font_registry.ensure("OpenSans-Regular") and font_registry.ensure("OpenSans-Bold"):
+            return "OpenSans-Regular"
+        return "Times-Roman"
+
+    @property
+    def _default_font_black(self):
+        if font_registry.ensure("OpenSans-Regular") and font_registry.ensure("OpenSans-Bold"):
+            return "OpenSans-Bold"
+        return "Times-Roman"
 
     def get_size(self):
         """
@@ -163,23 +186,88 @@ class ReporteClaseBase(canvas.Canvas):
         :return: none.
         :rtype: none
         """
-        svg_img = svglib.svg2rlg(path)
+        form = self.svg_form(path)
+        if form is None:
+            return
+        _, width, height = form
         if w is not None:
-            scaling_w_factor = w / svg_img.minWidth()
-            scaling_h_factor = h / svg_img.height
+            self.draw_svg_form(form, xpos, ypos, w / width, h / height)
+        else:
+            self.draw_svg_form(form, xpos, ypos)
 
-            svg_img.width = svg_img.minWidth() * scaling_w_factor
-            svg_img.height = svg_img.height * scaling_h_factor
+    def svg_form(self, path):
+        """
+        Devuelve el Form XObject de un SVG, definiéndolo la primera vez que se
+        usa en el documento. El SVG se analiza una sola vez por proceso y se
+        escribe una sola vez por PDF; cada uso es una referencia al form.
 
-            svg_img.scale(scaling_w_factor, scaling_h_factor)
+        :param path: ubicacion del archivo SVG.
+        :type path: str
+        :return: nombre del form, ancho y alto del SVG, o None si no se puede leer.
+        :rtype: tuple
+        """
+        key, drawing = svg_drawings.get(path)
+        if drawing is None:
+            return None
+
+        form = self.__svg_forms.get(key)
+        if form is None:
+            name = "svg{}".format(len(self.__svg_forms))
+            width, height = drawing.minWidth(), drawing.height
+            try:
+                x1, y1, x2, y2 = drawing.getBounds()
+            except Exception:
+                x1, y1, x2, y2 = 0, 0, width, height
+            self.beginForm(
+                name,
+                lowerx=min(0, x1),
+                lowery=min(0, y1),
+                upperx=max(width, x2),
+                uppery=max(height, y2)
+            )
+            renderPDF.draw(drawing, self, 0, 0)
+            self.endForm()
+            form = self.__svg_forms[key] = (name, width, height)
+        return form
 
-        renderPDF.draw(svg_img, self, xpos, ypos)
+    def draw_svg_form(self, form, xpos, ypos, w_scale_factor=1, h_scale_factor=1):
+        """
+        Dibuja un form de :meth:`svg_form` escalado en la posición dada.
+        """
+        self.saveState()
+        self.translate(xpos, ypos)
+        self.scale(w_scale_factor, h_scale_factor)
+        self.doForm(form[0])
+        self.restoreState()
 
 
 class TemplateBased(ReporteClaseBase):
-    def __init__(self, template, *args, **kwargs):
+    """
+    Reporte dibujado a partir de un template.
+
+    :param template: template a dibujar.
+    :type template: TemplateDocument or dict
+    :param render_list: geometría del template ya calculada, para compartirla entre documentos.
+    :type render_list: list(RenderItem)
+    :param is_static: indica si un nodo se ve igual en todas las páginas. Los nodos estáticos
+        consecutivos se dibujan una sola vez por documento como Form XObject.
+    :type is_static: callable
+    :param progress: ``progress(done, total)`` se llama por cada nodo de la página; puede
+        lanzar :class:`ExportCanceled` para abortar.
+    :type progress: callable
+    """
+
+    def __init__(self, template, *args, render_list=None, is_static=None, progress=None, **kwargs):
         super(TemplateBased, self).__init__(*args, **kwargs)
+        if not isinstance(template, TemplateDocument):
+            template = TemplateDocument.from_dict(template)
         self.__template = template
+        self.__render_list = render_list
+        self.__is_static = is_static
+        self.__layers = None
+        self.__static_forms = None
+        self.__progress = progress
+        self.__drawn = 0
 
     def draw_container(self, x, y, w, h, style={}):
         shape = style.get("shape", "rect")
@@ -225,52 +313,109 @@ class TemplateBased(ReporteClaseBase):
                 fill=fill
             )
 
+    @property
+    def render_list(self):
+        """
+        Page geometry of the template, built on first use and reused by every render.
+
+        :rtype: list(RenderItem)
+        """
+        if self.__render_list is None:
+            self.__render_list = build_render_list(self.__template, self._size[1])
+        return self.__render_list
+
+    @property
+    def layers(self):
+        """
+        Render list split in runs of consecutive static or variable items, in
+        drawing order.
+
+        :rtype: list(tuple(bool, list(RenderItem)))
+        """
+        if self.__layers is None:
+            layers = []
+            for item in self.render_list:
+                static = self.__is_static is not None and self.__is_static(item.node)
+                if layers and layers[-1][0] == static:
+                    layers[-1][1].append(item)
+                else:
+                    layers.append((static, [item]))
+            self.__layers = layers
+        return self.__layers
+
+    def static_forms(self):
+        """
+        Nombres de los Form XObjects de las capas estáticas (None para las
+        variables), definiéndolos la primera vez. Se definen antes de dibujar
+        la página, y los SVG que usan antes que la capa, para no anidar forms.
+
+        :rtype: list
+        """
+        if self.__static_forms is None:
+            self.__static_forms = []
+            for index, (static, items) in enumerate(self.layers):
+                if not static:
+                    self.__static_forms.append(None)
+                    continue
+                for item in items:
+                    path = (item.node.properties or {}).get("path", "")
+                    if item.node.kind == "image" and path.lower().endswith("svg") and os.path.exists(path):
+                        self.svg_form(path)
+                name = "static{}".format(index)
+                self.beginForm(name)
+                self.draw_items(items)
+                self.endForm()
+                self.__static_forms.append(name)
+        return self.__static_forms
+
     def draw_slide(self):
-        def walk_nodes(node, parent=None):
-            node["_parent"] = parent
-            yield node
-            for child in node.get("children", []):
-                yield from walk_nodes(child, node)
-
-        def get_absolute_coords(node):
-            x, y = node["component"]["pos"]
-            w, h = node["component"]["size"]
-
-            current_node = node
-            while current_node.get("_parent") is not None:
-                parent = current_node["_parent"]
-                px, py = parent["component"]["pos"]
-                x += px
-                y += py
-                current_node = parent
-
-            y = self._size[1] - y - h
-            return x, y, w, h
-        
-        def clip_to_parent(node, x, y, w, h):
-            current = node.get("_parent")
-            while current is not None and current.get("constraints") is None:
-                parent_x, parent_y, parent_w, parent_h = get_absolute_coords(current)
-                x1, y1 = x, y
-                x2, y2 = x + w, y + h
-                px1, py1 = parent_x, parent_y
-                px2, py2 = parent_x + parent_w, parent_y + parent_h
-                x1 = max(x1, px1)
-                y1 = max(y1, py1)
-                x2 = min(x2, px2)
-                y2 = min(y2, py2)
-                w = max(0, x2 - x1)
-                h = max(0, y2 - y1)
-                x, y = x1, y1
-                current = current.get("_parent")
-            return x, y, w, h
-
-        for node in walk_nodes(self.__template):
-            x, y, w, h = get_absolute_coords(node)
-            x, y, w_clip, h_clip = clip_to_parent(node, x, y, w, h)
-
-            bbox_style = node.get("styles", dict())
-            node_type = node["type"].lower()
+        """
+        Dibuja el template en una página y guarda el reporte.
+        """
+        self.draw_page()
+        self.save()
+
+    def draw_page(self, values=None):
+        """
+        Dibuja el template en una nueva página.
+
+        :param values: propiedades que reemplazan a las de los nodos (ver :meth:`CompiledTemplate.bind`).
+        :type values: dict
+        """
+        self.__drawn = 0
+        if self.__is_static is None:
+            self.draw_items(self.render_list, values)
+        else:
+            forms = self.static_forms()
+            self.__drawn = 0
+            for name, (_, items) in zip(forms, self.layers):
+                if name is not None:
+                    self.__advance(len(items))
+                    self.doForm(name)
+                else:
+                    self.draw_items(items, values)
+        self.showPage()
+
+    def draw_items(self, items, values=None):
+        """
+        Dibuja los nodos ``items`` en la página o form actual.
+
+        :param items: nodos ubicados en la página.
+        :type items: list(RenderItem)
+        :param values: propiedades que reemplazan a las de los nodos.
+        :type values: dict
+        """
+        for item in items:
+            self.__advance()
+            node = item.node
+            properties = node.properties
+            if values and node in values:
+                properties = values[node]
+            w, h = item.w, item.h
+            x, y, w_clip, h_clip = item.clip
+
+            bbox_style = node.styles or dict()
+            node_type = node.kind
             if node_type == "container":
                 self.draw_container(
                     x=x,
@@ -290,11 +435,13 @@ class TemplateBased(ReporteClaseBase):
                         style=bbox_style
                     )
                   
-                text_properties = node.get("properties", {})
+                text_properties = properties or {}
                 
                 font = text_properties.get("font", "Times-Roman")
                 if font == "Times New Roman":
                     font = "Times-Roman"
+                elif font in font_registry and not font_registry.ensure(font):
+                    font = "Times-Roman"
 
                 font_size = text_properties.get("font_size", 12)
                 font_color = text_properties.get("font_color", "#000000")
@@ -339,7 +486,7 @@ class TemplateBased(ReporteClaseBase):
                     paragraph.wrap(w, h)
                 table.drawOn(canvas=self, x=x, y=y-(h-h_clip))
             elif node_type == "image":
-                image_properties = node.get("properties", {})
+                image_properties = properties or {}
                 path = image_properties.get("path", "")
                 if not os.path.exists(path):
                     continue
@@ -358,9 +505,10 @@ class TemplateBased(ReporteClaseBase):
                 ha = image_properties.get("ha", "center")
                 va = image_properties.get("va", "center")
                 if path.lower().endswith("svg"):
-                    img = svglib.svg2rlg(path)
-                    original_width = img.minWidth()
-                    original_height = img.height
+                    form = self.svg_form(path)
+                    if form is None:
+                        continue
+                    _, original_width, original_height = form
                     w_scale_factor = 1
                     h_scale_factor = 1
                     if image_properties.get("keep_aspect_ratio", False):
@@ -378,12 +526,19 @@ class TemplateBased(ReporteClaseBase):
                     else:
                         w_scale_factor = w / original_width
                         h_scale_factor = h / original_height
-                    img.width = original_width * w_scale_factor
-                    img.height = original_height * h_scale_factor
-                    img.scale(w_scale_factor, h_scale_factor)
-                else:
-                    kind = "proportional" if image_properties.get("keep_aspect_ratio") else "direct"
-                    img = Image(path, kind=kind, width=w, height=h)
+
+                    # Same placement the table cell gave the scaled drawing
+                    img_w = original_width * w_scale_factor
+                    img_h = original_height * h_scale_factor
+                    img_x = {"left": x, "center": x + (w - img_w) / 2, "right": x + w - img_w}[ha]
+                    img_y = {"bottom": y, "center": y + (h - img_h) / 2, "top": y + h - img_h}[va]
+                    self.draw_svg_form(form, img_x, img_y, w_scale_factor, h_scale_factor)
+                    continue
+
+                keep_aspect_ratio = bool(image_properties.get("keep_aspect_ratio"))
+                kind = "proportional" if keep_aspect_ratio else "direct"
+                source = self.image_preparer.prepare(path, w, h, keep_aspect_ratio)
+                img = Image(source, kind=kind, width=w, height=h)
                 data = [[img]]
                 table = Table(data, colWidths=w, rowHeights=h)
                 table.setStyle([
@@ -396,13 +551,52 @@ class TemplateBased(ReporteClaseBase):
                 ])
                 table.wrapOn(self, w, h)
                 table.drawOn(canvas=self, x=x, y=y)
-        self.save()
 
 
-def export(template, filename):
+    def __advance(self, count=1):
+        self.__drawn += count
+        if self.__progress is not None:
+            self.__progress(self.__drawn, len(self.render_list))
+
+
+def export(template, filename, image_dpi=DEFAULT_DPI, jpeg_quality=DEFAULT_JPEG_QUALITY, progress=None):
+    """
+    Render a template to a PDF file.
+
+    :param template: The template, as a document or in the JSON template format.
+    :type template: TemplateDocument or dict
+    :param filename: Output path.
+    :type filename: str
+    :param image_dpi: Resolution raster images are resampled to (None keeps the originals).
+    :type image_dpi: int
+    :param jpeg_quality: JPEG quality of the re-encoded photos.
+    :type jpeg_quality: int
+    :param progress: Called as ``progress(done, total)`` for every node; may raise
+        :class:`ExportCanceled` to abort.
+    :type progress: callable
+    :return: Export summary, see :meth:`ImagePreparer.stats`.
+    :rtype: dict
+    """
+    if not isinstance(template, TemplateDocument):
+        template = TemplateDocument.from_dict(template)
     template_based_report = TemplateBased(
         template=template,
         filename=filename,
-        pagesize=template["component"]["size"]
+        pagesize=template.size,
+        image_dpi=image_dpi,
+        jpeg_quality=jpeg_quality,
+        progress=progress
     )
     template_based_report.draw_slide()
+
+    summary = template_based_report.image_preparer.stats()
+    logger.info(
+        "Exported {}: {} images ({} reused), {} KB of image data embedded, {} KB saved".format(
+            filename,
+            summary["images"],
+            summary["reused"],
+            summary["embedded_bytes"] // 1024,
+            summary["saved_bytes"] // 1024
+        )
+    )
+    return summary
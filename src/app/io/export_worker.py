@@ -0,0 +1,77 @@
+import traceback
+import logging
+logger = logging.getLogger(__name__)
+
+from PyQt5 import QtCore
+
+from app.io.export_data import generate_template
+from app.io.export_code_to_pdf import ExportCanceled
+
+
+class ExportWorker(QtCore.QThread):
+    """
+    Writes a template to disk off the GUI thread.
+
+    The worker receives a snapshot of the document (its JSON template dict,
+    taken on the GUI thread), so the canvas can keep changing while the file
+    is written. The file is replaced atomically once complete: a canceled or
+    failed export leaves no partial file behind.
+
+    Señales:
+        progress(int, int): nodes drawn and total nodes
+        export_finished(str, object): filename and export summary (None for JSON)
+        export_failed(str, str): error type and message
+        export_canceled()
+    """
+    progress = QtCore.pyqtSignal(int, int)
+    export_finished = QtCore.pyqtSignal(str, object)
+    export_failed = QtCore.pyqtSignal(str, str)
+    export_canceled = QtCore.pyqtSignal()
+
+    def __init__(self, parent=None):
+        super(ExportWorker, self).__init__(parent)
+        self.__filename = ""
+        self.__data = None
+        self.__extension = ""
+        self.__cancel = False
+
+    def export(self, filename, data, extension):
+        """
+        Start writing ``data`` to ``filename``.
+
+        :param data: Template snapshot, see :meth:`TemplateDocument.to_dict`.
+        :type data: dict
+        """
+        self.__filename = filename
+        self.__data = data
+        self.__extension = extension
+        self.__cancel = False
+        self.start()
+
+    @QtCore.pyqtSlot()
+    def cancel(self):
+        if self.isRunning():
+            self.__cancel = True
+
+    def __on_progress(self, done, total):
+        if self.__cancel:
+            raise ExportCanceled()
+        self.progress.emit(done, total)
+
+    def run(self):
+        try:
+            summary = generate_template(
+                self.__filename,
+                self.__data,
+                self.__extension,
+                progress=self.__on_progress
+            )
+        except ExportCanceled:
+            self.export_canceled.emit()
+        except Exception as e:
+            logger.debug(traceback.format_exc())
+            self.export_failed.emit(type(e).__name__, str(e))
+        else:
+            self.export_finished.emit(self.__filename, summary)
+        finally:
+            self.__data = None
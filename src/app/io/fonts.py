@@ -0,0 +1,89 @@
+import os
+import time
+import threading
+import logging
+logger = logging.getLogger(__name__)
+
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont, TTFError
+
+
+PATH_FONTS = os.path.join("assets", "fonts")
+
+DEFAULT_FONTS = {
+    "OpenSans-Regular": "OpenSans_Condensed-Regular.ttf",
+    "OpenSans-Bold": "OpenSans_Condensed-Bold.ttf"
+}
+
+
+class FontRegistry(object):
+    """
+    Registers TrueType fonts in ReportLab at most once per process.
+
+    Fonts are parsed lazily the first time :meth:`ensure` asks for them (or
+    up front with :meth:`preload`, e.g. in the initializer of a worker
+    process). Failures are remembered too, so a missing file is not looked
+    up again for every document.
+
+    :param path_fonts: Directory of the font files.
+    :type path_fonts: str
+    :param fonts: Font name -> file name.
+    :type fonts: dict
+    """
+
+    def __init__(self, path_fonts=PATH_FONTS, fonts=None):
+        self.path_fonts = path_fonts
+        self.fonts = dict(DEFAULT_FONTS if fonts is None else fonts)
+        self.__status = dict()      # font name -> True (registered) / False (failed)
+        self.__seconds = dict()     # font name -> registration time
+        self.__lock = threading.Lock()
+
+    def __contains__(self, name):
+        return name in self.fonts
+
+    def ensure(self, name):
+        """
+        Register ``name`` if needed.
+
+        :return: True if the font can be used.
+        :rtype: bool
+        """
+        status = self.__status.get(name)
+        if status is not None:
+            return status
+        if name not in self.fonts:
+            return False
+
+        with self.__lock:
+            status = self.__status.get(name)
+            if status is None:
+                start = time.perf_counter()
+                try:
+                    pdfmetrics.registerFont(TTFont(name, os.path.join(self.path_fonts, self.fonts[name])))
+                    status = True
+                except (TTFError, OSError) as e:
+                    logger.warning("Font {} not available: {}".format(name, e))
+                    status = False
+                self.__seconds[name] = time.perf_counter() - start
+                self.__status[name] = status
+                logger.debug("Font {} registered in {:.1f} ms".format(name, self.__seconds[name] * 1000))
+        return status
+
+    def preload(self, names=None):
+        """
+        Register ``names`` (every known font by default) now.
+
+        :return: Font name -> availability.
+        :rtype: dict
+        """
+        return {name: self.ensure(name) for name in (self.fonts if names is None else names)}
+
+    def stats(self):
+        return {
+            "registered": sum(1 for status in self.__status.values() if status),
+            "failed": sum(1 for status in self.__status.values() if not status),
+            "seconds": sum(self.__seconds.values())
+        }
+
+
+font_registry = FontRegistry()
@@ -0,0 +1,146 @@
+import io
+import os
+import math
+import logging
+logger = logging.getLogger(__name__)
+
+from PIL import Image as PILImage
+
+
+DEFAULT_DPI = 150
+DEFAULT_JPEG_QUALITY = 85
+# Images without alpha and with more colors than this are treated as photos
+PHOTO_MIN_COLORS = 256
+POINTS_PER_INCH = 72
+
+
+class ImagePreparer(object):
+    """
+    Prepares raster images before they are embedded in a PDF.
+
+    Each image is resampled to ``dpi`` for the size it is placed at (never
+    upsampled), and photos are re-encoded as JPEG at ``jpeg_quality``; other
+    images keep a lossless PNG encoding. The original file is embedded as is
+    whenever the prepared data would not be smaller. Results are kept per
+    ``(path, mtime, target size)``, so one instance should live as long as
+    the document: repeated uses are prepared once, and ReportLab embeds
+    identical image data once. An instance may also be shared by several
+    documents; ``max_images`` then bounds the prepared data kept, dropping
+    the least recently used images first.
+
+    :param dpi: Target resolution, or None to embed the original files.
+    :type dpi: int
+    :param jpeg_quality: JPEG quality (1-95) used for photos.
+    :type jpeg_quality: int
+    :param max_images: Prepared images kept, or None for no limit.
+    :type max_images: int or None
+    """
+
+    def __init__(self, dpi=DEFAULT_DPI, jpeg_quality=DEFAULT_JPEG_QUALITY, max_images=None):
+        self.dpi = dpi
+        self.jpeg_quality = jpeg_quality
+        self.max_images = max_images
+        self.__prepared = dict()    # (path, mtime, target size, keep_aspect_ratio) -> bytes or None (original)
+        # Each distinct embedded object (the original path or a prepared key) -> (original size, embedded size)
+        self.__embedded = dict()
+        self.prepared = 0
+        self.reused = 0
+
+    def target_size(self, w, h):
+        """
+        Size in pixels of a ``w`` x ``h`` points box at the target resolution.
+        """
+        return (
+            max(1, math.ceil(w * self.dpi / POINTS_PER_INCH)),
+            max(1, math.ceil(h * self.dpi / POINTS_PER_INCH))
+        )
+
+    def prepare(self, path, w, h, keep_aspect_ratio=True):
+        """
+        Return the image source to place ``path`` in a ``w`` x ``h`` points box:
+        the path itself, or the prepared image data.
+
+        :rtype: str or io.BytesIO
+        """
+        if self.dpi is None:
+            return path
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return path
+
+        key = (path, stat.st_mtime_ns, self.target_size(w, h), bool(keep_aspect_ratio))
+        if key in self.__prepared:
+            self.reused += 1
+            # Most recently used last
+            self.__prepared[key] = self.__prepared.pop(key)
+        else:
+            self.prepared += 1
+            data = self.__prepare(path, key[2], keep_aspect_ratio)
+            if data is None or len(data) >= stat.st_size:
+                data = None
+                self.__embedded[path] = (stat.st_size, stat.st_size)
+            else:
+                self.__embedded[key] = (stat.st_size, len(data))
+            self.__prepared[key] = data
+            if self.max_images is not None and len(self.__prepared) > self.max_images:
+                del self.__prepared[next(iter(self.__prepared))]
+
+        data = self.__prepared[key]
+        return path if data is None else io.BytesIO(data)
+
+    def stats(self):
+        original_bytes = sum(original for original, _ in self.__embedded.values())
+        embedded_bytes = sum(embedded for _, embedded in self.__embedded.values())
+        return {
+            "images": self.prepared,
+            "reused": self.reused,
+            "original_bytes": original_bytes,
+            "embedded_bytes": embedded_bytes,
+            "saved_bytes": original_bytes - embedded_bytes
+        }
+
+    @staticmethod
+    def has_alpha(image):
+        return image.mode in ("RGBA", "LA", "PA", "RGBa", "La") or "transparency" in image.info
+
+    def __prepare(self, path, box, keep_aspect_ratio):
+        try:
+            with PILImage.open(path) as image:
+                return self.__encode(image, box, keep_aspect_ratio)
+        except (OSError, ValueError) as e:
+            logger.warning("Could not prepare {}: {}".format(path, e))
+            return None
+
+    def __encode(self, image, box, keep_aspect_ratio):
+        width, height = image.size
+        if keep_aspect_ratio:
+            factor = min(box[0] / width, box[1] / height, 1)
+            size = (max(1, round(width * factor)), max(1, round(height * factor)))
+        else:
+            size = (min(width, box[0]), min(height, box[1]))
+
+        source_format = image.format
+        alpha = self.has_alpha(image)
+        if image.mode not in ("1", "L", "RGB", "RGBA", "CMYK"):
+            image = image.convert("RGBA" if alpha else "RGB")
+        if size != image.size:
+            image = image.resize(size, PILImage.LANCZOS)
+
+        photo = not alpha and (
+            source_format == "JPEG" or image.getcolors(PHOTO_MIN_COLORS) is None
+        )
+        if size == (width, height) and (not photo or source_format == "JPEG"):
+            # Already at or below the target resolution and in its final format
+            return None
+
+        data = io.BytesIO()
+        if photo:
+            if image.mode not in ("L", "RGB", "CMYK"):
+                image = image.convert("RGB")
+            image.save(data, "JPEG", quality=self.jpeg_quality, optimize=True)
+        else:
+            if image.mode == "CMYK":
+                image = image.convert("RGB")
+            image.save(data, "PNG", optimize=True)
+        return data.getvalue()
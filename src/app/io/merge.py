@@ -0,0 +1,265 @@
+"""
+Mail merge: templates with ``{{field.path}}`` placeholders bound to data rows.
+"""
+import os
+import re
+import csv
+import json
+from xml.sax.saxutils import escape
+
+from app.models.template import TemplateDocument
+from app.io.render_tree import build_render_list
+from app.io.export_code_to_pdf import TemplateBased
+from app.io.image_prep import ImagePreparer, DEFAULT_DPI, DEFAULT_JPEG_QUALITY
+
+
+PLACEHOLDER = re.compile(r"\{\{\s*([\w.\- ]+?)\s*\}\}")
+INDEX_FIELD = "_index"
+# Characters not allowed in a file name bound from a row
+UNSAFE_FILENAME = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+# Prepared images kept across the documents of a merge
+MAX_PREPARED_IMAGES = 256
+
+# Node properties that may hold placeholders, per node type
+BOUND_PROPERTIES = {
+    "text": ("text",),
+    "image": ("path",)
+}
+
+
+def lookup(row, field, strict=False):
+    """
+    Value of ``field`` in ``row``. A dotted field (``customer.name``) is looked
+    up as a column name first (CSV headers), then through nested mappings
+    (JSONL objects).
+    """
+    if field in row:
+        value = row[field]
+    else:
+        value = row
+        for part in field.split("."):
+            if isinstance(value, dict) and part in value:
+                value = value[part]
+            elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+                value = value[int(part)]
+            else:
+                if strict:
+                    raise KeyError(field)
+                return ""
+    return "" if value is None else str(value)
+
+
+class Field(object):
+    """
+    A string with placeholders, split once into literal parts and field names.
+    """
+    __slots__ = ("parts", "fields")
+
+    def __init__(self, text):
+        self.parts = []     # (literal, field or None)
+        self.fields = []
+        position = 0
+        for match in PLACEHOLDER.finditer(text):
+            self.parts.append((text[position:match.start()], match.group(1)))
+            self.fields.append(match.group(1))
+            position = match.end()
+        self.parts.append((text[position:], None))
+
+    def render(self, row, quote=None, strict=False):
+        values = []
+        for literal, field in self.parts:
+            values.append(literal)
+            if field is not None:
+                value = lookup(row, field, strict)
+                values.append(quote(value) if quote is not None else value)
+        return "".join(values)
+
+
+def quote_filename(value):
+    """
+    Make a row value safe to use inside a file name: path separators and
+    ``..`` are replaced, so it cannot leave the output directory.
+    """
+    return UNSAFE_FILENAME.sub("_", value).replace("..", "_")
+
+
+def compile_field(text):
+    """
+    :return: The compiled string, or None if it has no placeholders.
+    :rtype: Field or None
+    """
+    if not isinstance(text, str) or PLACEHOLDER.search(text) is None:
+        return None
+    return Field(text)
+
+
+class CompiledTemplate(object):
+    """
+    A template prepared once for any number of data rows: the page geometry is
+    computed a single time and the placeholders of every node are parsed up
+    front, so binding a row only formats the variable strings.
+
+    :param template: The template, as a document or in the JSON template format.
+    :type template: TemplateDocument or dict
+    :param strict: Raise KeyError for fields missing in a row instead of leaving them empty.
+    :type strict: bool
+    """
+
+    def __init__(self, template, strict=False):
+        if not isinstance(template, TemplateDocument):
+            template = TemplateDocument.from_dict(template)
+        self.document = template
+        self.strict = strict
+        self.render_list = build_render_list(template)
+        self.fields = dict()    # node -> {property: Field}
+        for item in self.render_list:
+            node = item.node
+            properties = node.properties or dict()
+            compiled = dict()
+            for key in BOUND_PROPERTIES.get(node.kind, ()):
+                field = compile_field(properties.get(key))
+                if field is not None:
+                    compiled[key] = field
+            if compiled:
+                self.fields[node] = compiled
+
+    @property
+    def size(self):
+        return self.document.size
+
+    def is_static(self, node):
+        """
+        Whether ``node`` looks the same for every row.
+        """
+        return node not in self.fields
+
+    def field_names(self):
+        names = []
+        for compiled in self.fields.values():
+            for field in compiled.values():
+                names.extend(field.fields)
+        return list(dict.fromkeys(names))
+
+    def bind(self, row, index=None):
+        """
+        Properties of the variable nodes for ``row``. Values bound into text
+        are escaped, since text is drawn as paragraph markup.
+
+        :param index: Row number, bound to ``{{_index}}`` as in file names.
+        :type index: int
+        :return: node -> properties.
+        :rtype: dict
+        """
+        if index is not None:
+            row = dict(row, **{INDEX_FIELD: index})
+        values = dict()
+        for node, compiled in self.fields.items():
+            properties = dict(node.properties)
+            for key, field in compiled.items():
+                quote = escape if key == "text" else None
+                properties[key] = field.render(row, quote, self.strict)
+            values[node] = properties
+        return values
+
+
+def iter_rows(path, encoding="utf-8"):
+    """
+    Stream the rows of a CSV (header row) or JSONL (one object per line) file.
+
+    :rtype: generator(dict)
+    """
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, newline="", encoding=encoding) as f:
+        if extension in (".jsonl", ".ndjson"):
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        else:
+            for row in csv.DictReader(f):
+                yield row
+
+
+def merge(template, rows, filename, per_row=False, pages_per_file=None, strict=False,
+          image_dpi=DEFAULT_DPI, jpeg_quality=DEFAULT_JPEG_QUALITY):
+    """
+    Render a template once per data row.
+
+    Rows are consumed one at a time, so ``rows`` should be a generator such
+    as :func:`iter_rows`. ReportLab keeps a document in memory until it is
+    saved: for large runs use ``per_row`` or ``pages_per_file`` to keep
+    memory flat.
+
+    :param template: The template, compiled or not.
+    :type template: CompiledTemplate or TemplateDocument or dict
+    :param rows: Data rows.
+    :type rows: iterable(dict)
+    :param filename: Output path. With ``per_row`` it may use placeholders,
+        including ``{{_index}}`` (the row number, from 1); without any, the
+        row number is appended; values bound into it cannot add directories
+        (see :func:`quote_filename`). With ``pages_per_file`` the volume
+        number is appended.
+    :type filename: str
+    :param per_row: Write one PDF per row instead of one page per row.
+    :type per_row: bool
+    :param pages_per_file: Split the multipage output in files of this many pages.
+    :type pages_per_file: int or None
+    :return: Number of rows and files written.
+    :rtype: dict
+    """
+    if not isinstance(template, CompiledTemplate):
+        template = CompiledTemplate(template, strict)
+    stem, extension = os.path.splitext(filename)
+    extension = extension or ".pdf"
+    name_field = compile_field(filename) if per_row else None
+    if name_field is not None:
+        # Files named after the rows stay under the literal directory of the pattern
+        output_dir = os.path.realpath(os.path.dirname(name_field.parts[0][0]))
+    # Images shared by the rows (a logo) are resampled once for all the files
+    image_preparer = ImagePreparer(image_dpi, jpeg_quality, max_images=MAX_PREPARED_IMAGES)
+
+    def new_document(path):
+        # Static layers pay off only across the pages of a document
+        return TemplateBased(
+            template=template.document,
+            filename=path,
+            pagesize=template.size,
+            image_preparer=image_preparer,
+            render_list=template.render_list,
+            is_static=None if per_row else template.is_static
+        )
+
+    report = None
+    files = 0
+    index = 0
+    for index, row in enumerate(rows, 1):
+        if per_row:
+            if name_field is not None:
+                path = name_field.render(dict(row, **{INDEX_FIELD: index}), quote_filename, strict)
+                if os.path.commonpath([output_dir, os.path.realpath(path)]) != output_dir:
+                    raise ValueError("Row {} would be written outside {}: {}".format(index, output_dir, path))
+            else:
+                path = "{}_{}{}".format(stem, index, extension)
+            report = new_document(path)
+            report.draw_page(template.bind(row, index))
+            report.save()
+            report = None
+            files += 1
+            continue
+
+        if report is None:
+            if pages_per_file:
+                path = "{}_{}{}".format(stem, files + 1, extension)
+            else:
+                path = filename
+            report = new_document(path)
+        report.draw_page(template.bind(row, index))
+        if pages_per_file and index % pages_per_file == 0:
+            report.save()
+            report = None
+            files += 1
+
+    if report is not None:
+        report.save()
+        files += 1
+    return {"rows": index, "files": files}
@@ -0,0 +1,82 @@
+"""
+Page geometry of a template, computed once for the PDF renderers.
+"""
+
+
+class RenderItem(object):
+    """
+    A template node placed on the page.
+
+    ``x``, ``y``, ``w`` and ``h`` are the absolute rectangle of the node in PDF
+    coordinates (origin at the bottom left corner of the page). ``clip`` is
+    ``(x, y, w, h)`` once clipped by the ancestors that do not lay out their
+    children.
+    """
+    __slots__ = ("node", "x", "y", "w", "h", "clip")
+
+    def __init__(self, node, x, y, w, h, clip):
+        self.node = node
+        self.x = x
+        self.y = y
+        self.w = w
+        self.h = h
+        self.clip = clip
+
+    def __repr__(self):
+        return "RenderItem({!r}, {}, {}, {}, {})".format(self.node, self.x, self.y, self.w, self.h)
+
+
+def build_render_list(template, page_height=None):
+    """
+    Place every node of ``template`` on the page in a single preorder pass.
+
+    Positions are relative to the parent, so each node adds its position to
+    the absolute origin of its parent; the clip rectangle handed to the
+    children is the node rectangle intersected with its own clip, or no clip
+    at all when the node has layout constraints. The template is not
+    modified, and the result can be drawn any number of times.
+
+    :param template: The template to place.
+    :type template: TemplateDocument
+    :param page_height: Height used to flip the Y axis (the canvas height by default).
+    :type page_height: int or float
+    :return: The render items in drawing (preorder) order.
+    :rtype: list(RenderItem)
+    """
+    if page_height is None:
+        page_height = template.size[1]
+
+    items = []
+    # node, absolute top left corner of the parent (Y down) and clip rectangle (x1, y1, x2, y2)
+    stack = [(template.root, 0, 0, None)]
+    while stack:
+        node, origin_x, origin_y, clip = stack.pop()
+        x, y = node.component.pos
+        w, h = node.component.size
+        x += origin_x
+        top = y + origin_y
+        y = page_height - top - h
+
+        rect = (x, y, x + w, y + h)
+        if clip is None:
+            clipped = (x, y, w, h)
+        else:
+            x1, y1, x2, y2 = _intersect(clip, rect)
+            clipped = (x1, y1, max(0, x2 - x1), max(0, y2 - y1))
+        items.append(RenderItem(node, x, y, w, h, clipped))
+
+        child_clip = None if node.constraints is not None else _intersect(clip, rect)
+        for child in reversed(node.children):
+            stack.append((child, x, top, child_clip))
+    return items
+
+
+def _intersect(clip, rect):
+    if clip is None:
+        return rect
+    return (
+        max(clip[0], rect[0]),
+        max(clip[1], rect[1]),
+        min(clip[2], rect[2]),
+        min(clip[3], rect[3])
+    )
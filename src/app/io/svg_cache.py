@@ -0,0 +1,60 @@
+import os
+import threading
+from collections import OrderedDict
+
+from svglib import svglib
+
+
+MAX_SVG_DRAWINGS = 128
+
+
+class SvgDrawingCache(object):
+    """
+    Process-wide cache of SVG files parsed into ReportLab drawings, keyed by
+    ``(path, mtime)``. Least recently used drawings are dropped beyond
+    ``max_drawings``.
+
+    Cached drawings are shared: callers must not scale or otherwise modify
+    them, but place them with a canvas transform instead.
+    """
+
+    def __init__(self, max_drawings=MAX_SVG_DRAWINGS):
+        self.max_drawings = max_drawings
+        self.__drawings = OrderedDict()     # (path, mtime) -> Drawing
+        self.__lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path):
+        """
+        Return ``(key, drawing)`` for the SVG at ``path``, or ``(None, None)``
+        if it cannot be read.
+        """
+        try:
+            key = (path, os.stat(path).st_mtime_ns)
+        except OSError:
+            return None, None
+
+        with self.__lock:
+            drawing = self.__drawings.get(key)
+            if drawing is not None:
+                self.hits += 1
+                self.__drawings.move_to_end(key)
+                return key, drawing
+            self.misses += 1
+
+        drawing = svglib.svg2rlg(path)
+        if drawing is None:
+            return None, None
+        with self.__lock:
+            self.__drawings[key] = drawing
+            while len(self.__drawings) > self.max_drawings:
+                self.__drawings.popitem(last=False)
+        return key, drawing
+
+    def clear(self):
+        with self.__lock:
+            self.__drawings.clear()
+
+
+svg_drawings = SvgDrawingCache()
@@ -0,0 +1,103 @@
+import time
+import logging
+logger = logging.getLogger(__name__)
+
+from PyQt5 import QtCore
+
+
+FRAME_BUDGET_MS = 12
+
+
+class TemplateLoader(QtCore.QObject):
+    """
+    Builds a template tree in time-sliced batches driven by a QTimer.
+
+    Nodes are visited in preorder and handed to ``build_node(node, context)``,
+    which creates the component and returns the context its children are built
+    with (or None to skip the subtree). Each batch runs for at most
+    ``frame_budget`` milliseconds with updates disabled on ``updates_widget``,
+    so the event loop keeps painting and the load can be canceled.
+
+    Señales:
+        progress(int, int): nodes built and total nodes
+        finished()
+        canceled()
+        failed(str, str): error type and message
+    """
+    progress = QtCore.pyqtSignal(int, int)
+    finished = QtCore.pyqtSignal()
+    canceled = QtCore.pyqtSignal()
+    failed = QtCore.pyqtSignal(str, str)
+
+    def __init__(self, build_node, frame_budget=FRAME_BUDGET_MS, parent=None):
+        super(TemplateLoader, self).__init__(parent)
+        self.__build_node = build_node
+        self.__frame_budget = frame_budget / 1000
+        self.__pending = []
+        self.__done = 0
+        self.__total = 0
+        self.__updates_widget = None
+
+        self.__timer = QtCore.QTimer(self)
+        self.__timer.setInterval(0)
+        self.__timer.timeout.connect(self.__process_batch)
+
+    @property
+    def is_running(self):
+        return self.__timer.isActive()
+
+    def start(self, root, context=None, updates_widget=None):
+        """
+        Start building ``root`` and its descendants.
+
+        :param root: Root node of the template.
+        :type root: TemplateNode
+        :param context: Context passed to ``build_node`` for the root node.
+        :type context: object
+        :param updates_widget: Widget whose updates are disabled while a batch runs.
+        :type updates_widget: QWidget or None
+        """
+        self.__timer.stop()
+        self.__pending = [(root, context)]
+        self.__done = 0
+        self.__total = sum(1 for _ in root.walk())
+        self.__updates_widget = updates_widget
+        self.progress.emit(0, self.__total)
+        self.__timer.start()
+
+    def cancel(self):
+        if not self.__timer.isActive():
+            return
+        self.__timer.stop()
+        self.__pending = []
+        self.canceled.emit()
+
+    def __process_batch(self):
+        deadline = time.perf_counter() + self.__frame_budget
+        if self.__updates_widget is not None:
+            self.__updates_widget.setUpdatesEnabled(False)
+        try:
+            while self.__pending and time.perf_counter() < deadline:
+                node, context = self.__pending.pop()
+                child_context = self.__build_node(node, context)
+                self.__done += 1
+                if child_context is None:
+                    continue
+                # Reversed so siblings are popped (and laid out) in document order
+                for child in reversed(node.children):
+                    self.__pending.append((child, child_context))
+        except Exception as e:
+            logger.exception("Template loading failed")
+            self.__timer.stop()
+            self.__pending = []
+            self.failed.emit(type(e).__name__, str(e))
+            return
+        finally:
+            if self.__updates_widget is not None:
+                self.__updates_widget.setUpdatesEnabled(True)
+
+        self.progress.emit(self.__done, self.__total)
+        if not self.__pending:
+            self.__timer.stop()
+            logger.debug("Template loaded: {} nodes".format(self.__done))
+            self.finished.emit()
@@ -0,0 +1,91 @@
+import logging
+logger = logging.getLogger(__name__)
+
+from app.models.template import TemplateNode
+from app.utils.stream_json import NodeStreamParser
+
+
+class TemplateStream(object):
+    """
+    Builds a template while its JSON is still being received.
+
+    The current design is kept until the first node of the response is known:
+    text without a template, or a request that fails before it, leaves it
+    untouched. Once it has been replaced, it is restored unless the streamed
+    template ends up complete.
+
+    :param snapshot: ``snapshot()`` returns the current design, in the JSON template format.
+    :type snapshot: callable
+    :param replace: ``replace()`` clears the design before the first node is built.
+    :type replace: callable
+    :param build_node: ``build_node(node, context)`` builds a node and returns the
+        context for its children, or None to skip them.
+    :type build_node: callable
+    :param restore: ``restore(design)`` rebuilds a design returned by ``snapshot``.
+    :type restore: callable
+    """
+
+    def __init__(self, snapshot, replace, build_node, restore):
+        self.__snapshot = snapshot
+        self.__replace = replace
+        self.__build_node = build_node
+        self.__restore = restore
+        self.__parser = NodeStreamParser()
+        self.__contexts = dict()    # parser node id -> context of its children
+        self.__design = None
+        self.started = False
+        self.failed = False
+
+    @property
+    def built(self):
+        """
+        Number of nodes built so far.
+        """
+        return len(self.__contexts)
+
+    def feed(self, text):
+        """
+        Build the nodes completed by the next chunk of the response. Any error
+        stops the build; :meth:`finish` then restores the design.
+        """
+        if self.failed:
+            return
+        try:
+            for node_id, parent_id, data in self.__parser.feed(text):
+                if not self.started:
+                    self.__design = self.__snapshot()
+                    self.started = True
+                    self.__replace()
+                if parent_id is not None and parent_id not in self.__contexts:
+                    continue    # Skipped subtree
+                context = self.__build_node(TemplateNode.from_dict(data), self.__contexts.get(parent_id))
+                if context is not None:
+                    self.__contexts[node_id] = context
+        except Exception:
+            logger.exception("Progressive template build failed")
+            self.failed = True
+
+    def finish(self):
+        """
+        The whole response has been received.
+
+        :return: Whether the streamed template is complete and was kept. If
+            not, the previous design is back and the response must be loaded
+            in full.
+        :rtype: bool
+        """
+        parser = self.__parser
+        if self.started and not self.failed and parser.done and parser.complete:
+            logger.debug("Template built while streaming: {} nodes".format(parser.nodes))
+            return True
+        self.abort()
+        return False
+
+    def abort(self):
+        """
+        The response will not be completed: put the previous design back.
+        """
+        if self.started:
+            self.started = False
+            design, self.__design = self.__design, None
+            self.__restore(design)
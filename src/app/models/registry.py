@@ -0,0 +1,135 @@
+import re
+
+
+class SequenceAllocator(object):
+    """
+    Hands out the integer suffixes used in component names ("Container_3").
+    Released numbers are reused before new ones are issued. Every operation is
+    amortized O(1).
+    """
+    __slots__ = ("_next", "_free", "_used")
+
+    def __init__(self):
+        self._next = 0
+        self._free = []
+        self._used = set()
+
+    def acquire(self):
+        while self._free:
+            sequence = self._free.pop()
+            if sequence not in self._used:
+                self._used.add(sequence)
+                return sequence
+
+        while self._next in self._used:
+            self._next += 1
+        sequence = self._next
+        self._used.add(sequence)
+        self._next += 1
+        return sequence
+
+    def reserve(self, sequence):
+        self._used.add(sequence)
+
+    def release(self, sequence):
+        if sequence in self._used:
+            self._used.remove(sequence)
+            self._free.append(sequence)
+
+
+class ComponentRegistry(object):
+    """
+    Tracks the live components of the designer.
+
+    Components are indexed by name (unique) and bucketed by type; names of
+    the form ``<type>_<n>`` reserve ``n`` in the sequence of that type so
+    :meth:`new_name` never hands out a name already in use.
+    """
+
+    def __init__(self):
+        self._entries = dict()      # name -> (widget, component type, sequence)
+        self._by_type = dict()      # component type -> {name: widget}
+        self._sequences = dict()    # component type -> SequenceAllocator
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return (entry[0] for entry in self._entries.values())
+
+    def _allocator(self, component_type):
+        allocator = self._sequences.get(component_type)
+        if allocator is None:
+            allocator = self._sequences[component_type] = SequenceAllocator()
+        return allocator
+
+    def _parse_sequence(self, name, component_type):
+        match = re.match(r"^{}_(\d+)$".format(re.escape(component_type)), name, re.IGNORECASE)
+        return int(match.group(1)) if match else None
+
+    def new_name(self, component_type):
+        """
+        Return an unused name for a new component of ``component_type``.
+
+        :param component_type: Component type (e.g. "Container").
+        :type component_type: str
+        :rtype: str
+        """
+        allocator = self._allocator(component_type)
+        while True:
+            sequence = allocator.acquire()
+            name = "{}_{}".format(component_type, sequence)
+            if name not in self._entries:
+                # Handed back by register()
+                allocator.release(sequence)
+                return name
+
+    def register(self, name, component_type, widget):
+        """
+        Add a component to the registry.
+
+        :raises KeyError: If the name is already in use.
+        """
+        if name in self._entries:
+            raise KeyError("Component '{}' is already registered".format(name))
+
+        sequence = self._parse_sequence(name, component_type)
+        if sequence is not None:
+            self._allocator(component_type).reserve(sequence)
+
+        self._entries[name] = (widget, component_type, sequence)
+        self._by_type.setdefault(component_type, dict())[name] = widget
+
+    def unregister(self, name):
+        """
+        Remove a component from the registry and free its name.
+
+        :return: The removed widget, or None if the name was not registered.
+        """
+        entry = self._entries.pop(name, None)
+        if entry is None:
+            return None
+
+        widget, component_type, sequence = entry
+        del self._by_type[component_type][name]
+        if sequence is not None:
+            self._allocator(component_type).release(sequence)
+        return widget
+
+    def get(self, name, default=None):
+        entry = self._entries.get(name)
+        return entry[0] if entry is not None else default
+
+    def of_type(self, component_type):
+        """
+        Return a view of the registered components of ``component_type``.
+        """
+        return self._by_type.get(component_type, dict()).values()
+
+    def clear(self):
+        self._entries.clear()
+        self._by_type.clear()
+        self._sequences.clear()
@@ -0,0 +1,243 @@
+"""
+Spatial index of the containers of a template, used for drop-target hit testing.
+"""
+
+
+MAX_QUAD_DEPTH = 8
+
+
+class _Quad(object):
+    __slots__ = ("x", "y", "w", "h", "level", "items", "quadrants")
+
+    def __init__(self, x, y, w, h, level):
+        self.x = x
+        self.y = y
+        self.w = w
+        self.h = h
+        self.level = level
+        self.items = dict()
+        self.quadrants = None
+
+    def quadrant_for(self, x1, y1, x2, y2):
+        """
+        Return the quadrant that fully contains the rectangle, or None if it
+        straddles the split lines.
+        """
+        if self.level >= MAX_QUAD_DEPTH:
+            return None
+        mx = self.x + self.w / 2
+        my = self.y + self.h / 2
+        if x2 <= mx:
+            column = 0
+        elif x1 >= mx:
+            column = 1
+        else:
+            return None
+        if y2 <= my:
+            row = 0
+        elif y1 >= my:
+            row = 1
+        else:
+            return None
+
+        if self.quadrants is None:
+            hw, hh = self.w / 2, self.h / 2
+            level = self.level + 1
+            self.quadrants = (
+                _Quad(self.x, self.y, hw, hh, level),
+                _Quad(mx, self.y, hw, hh, level),
+                _Quad(self.x, my, hw, hh, level),
+                _Quad(mx, my, hw, hh, level)
+            )
+        return self.quadrants[row * 2 + column]
+
+
+class QuadTree(object):
+    """
+    MX-CIF quadtree: each rectangle is stored in the smallest quadrant that
+    fully contains it, so a point query only visits one root-to-leaf path.
+    Rectangles are ``(x1, y1, x2, y2)`` tuples with exclusive right/bottom edges.
+    """
+
+    def __init__(self, width, height):
+        self._root = _Quad(0, 0, max(width, 1), max(height, 1), 0)
+        self._locations = dict()   # key -> (quad, rect)
+
+    def __len__(self):
+        return len(self._locations)
+
+    @property
+    def width(self):
+        return self._root.w
+
+    @property
+    def height(self):
+        return self._root.h
+
+    def __contains__(self, key):
+        return key in self._locations
+
+    def insert(self, key, rect):
+        if key in self._locations:
+            self.remove(key)
+
+        x1, y1, x2, y2 = rect
+        quad = self._root
+        # Rectangles outside the canvas bounds stay at the root
+        if x1 >= quad.x and y1 >= quad.y and x2 <= quad.x + quad.w and y2 <= quad.y + quad.h:
+            while True:
+                quadrant = quad.quadrant_for(x1, y1, x2, y2)
+                if quadrant is None:
+                    break
+                quad = quadrant
+        quad.items[key] = rect
+        self._locations[key] = (quad, rect)
+
+    def remove(self, key):
+        location = self._locations.pop(key, None)
+        if location is not None:
+            del location[0].items[key]
+
+    def query_point(self, x, y):
+        """
+        Yield the keys whose rectangle contains the point.
+        """
+        quad = self._root
+        while quad is not None:
+            for key, (x1, y1, x2, y2) in quad.items.items():
+                if x1 <= x < x2 and y1 <= y < y2:
+                    yield key
+            if quad.quadrants is None:
+                break
+            column = 0 if x < quad.x + quad.w / 2 else 1
+            row = 0 if y < quad.y + quad.h / 2 else 1
+            quad = quad.quadrants[row * 2 + column]
+
+    def items(self):
+        return ((key, location[1]) for key, location in self._locations.items())
+
+
+class ContainerIndex(object):
+    """
+    Keeps the absolute, ancestor-clipped rectangle and the depth of every
+    container node of a template in a :class:`QuadTree`.
+
+    Node positions are relative to their parent, so moving a container
+    changes the absolute rectangle of its whole subtree; :meth:`update`
+    recomputes that subtree only.
+    """
+    CONTAINER_KIND = "container"
+
+    def __init__(self, width, height):
+        self._tree = QuadTree(width, height)
+        self._depths = dict()     # node -> (depth, insertion order)
+        self._order = 0
+
+    def __len__(self):
+        return len(self._tree)
+
+    def resize(self, width, height):
+        items = list(self._tree.items())
+        self._tree = QuadTree(width, height)
+        for node, rect in items:
+            self._tree.insert(node, rect)
+
+    def clear(self):
+        self._tree = QuadTree(self._tree.width, self._tree.height)
+        self._depths.clear()
+
+    @staticmethod
+    def _origin_and_clip(node):
+        """
+        Absolute origin of ``node``'s parent and the clip rectangle formed by
+        the parent and its ancestors.
+        """
+        chain = list(node.ancestors())
+        ox, oy = 0, 0
+        clip = None
+        for ancestor in reversed(chain):
+            ax, ay = ancestor.component.pos
+            if ancestor.parent is None:
+                ax, ay = 0, 0     # The canvas is the origin of the template
+            ox += ax
+            oy += ay
+            w, h = ancestor.component.size
+            clip = _intersect(clip, (ox, oy, ox + w, oy + h))
+        return ox, oy, clip, len(chain)
+
+    def update(self, node):
+        """
+        Recompute the entries of ``node`` and its descendant containers.
+        Nodes detached from the canvas are removed.
+        """
+        root = node
+        while root.parent is not None:
+            root = root.parent
+        if root.kind != "canvas":
+            self.remove(node)
+            return
+        if root is node:
+            for child in node.children:
+                self.update(child)
+            return
+
+        ox, oy, clip, depth = self._origin_and_clip(node)
+        stack = [(node, ox, oy, clip, depth)]
+        while stack:
+            current, px, py, parent_clip, current_depth = stack.pop()
+            x, y = current.component.pos
+            w, h = current.component.size
+            x += px
+            y += py
+            rect = _intersect(parent_clip, (x, y, x + w, y + h))
+
+            if current.kind == self.CONTAINER_KIND:
+                if rect[0] < rect[2] and rect[1] < rect[3]:
+                    if current not in self._depths:
+                        self._order += 1
+                        self._depths[current] = (current_depth, self._order)
+                    else:
+                        self._depths[current] = (current_depth, self._depths[current][1])
+                    self._tree.insert(current, rect)
+                else:
+                    self._tree.remove(current)
+
+            for child in current.children:
+                stack.append((child, x, y, rect, current_depth + 1))
+
+    def remove(self, node):
+        """
+        Remove ``node`` and its descendants from the index.
+        """
+        for current in node.walk():
+            self._tree.remove(current)
+            self._depths.pop(current, None)
+
+    def deepest_at(self, x, y, exclude=None):
+        """
+        Return the deepest container under the point (canvas coordinates),
+        ignoring ``exclude`` and its subtree. Among siblings at the same depth
+        the most recently indexed (topmost) container wins.
+
+        :rtype: TemplateNode or None
+        """
+        best = None
+        best_key = None
+        for node in self._tree.query_point(x, y):
+            if exclude is not None and (node is exclude or node.is_descendant_of(exclude)):
+                continue
+            key = self._depths.get(node, (0, 0))
+            if best_key is None or key > best_key:
+                best, best_key = node, key
+        return best
+
+
+def _intersect(clip, rect):
+    if clip is None:
+        return rect
+    return (
+        max(clip[0], rect[0]),
+        max(clip[1], rect[1]),
+        min(clip[2], rect[2]),
+        min(clip[3], rect[3])
+    )
@@ -0,0 +1,290 @@
+"""
+Headless representation of a template.
+
+The designer widgets are views over these nodes and keep them in sync, so the
+document can be serialized, rendered or inspected without importing PyQt5.
+"""
+
+
+DEFAULT_CANVAS_SIZE = [1000, 1000]
+DEFAULT_COMPONENT_SIZE = [200, 200]
+
+
+class Component(object):
+    """
+    Geometry of a node: position relative to its parent, size and size policy.
+    """
+    __slots__ = ("pos", "size", "size_policy")
+
+    def __init__(self, pos=None, size=None, size_policy=None):
+        self.pos = list(pos) if pos is not None else [0, 0]
+        self.size = list(size) if size is not None else list(DEFAULT_COMPONENT_SIZE)
+        self.size_policy = list(size_policy) if size_policy is not None else ["fixed", "fixed"]
+
+    def to_dict(self):
+        return {
+            "pos": list(self.pos),
+            "size": list(self.size),
+            "size_policy": list(self.size_policy)
+        }
+
+    @classmethod
+    def from_dict(cls, data, default_size=None):
+        return cls(
+            pos=data.get("pos"),
+            size=data.get("size", default_size),
+            size_policy=data.get("size_policy")
+        )
+
+
+class Constraints(object):
+    """
+    Layout applied by a canvas or container to its children.
+    """
+    __slots__ = ("layout", "margins", "spacing")
+
+    def __init__(self, layout="horizontal", margins=None, spacing=0):
+        self.layout = layout
+        self.margins = list(margins) if margins is not None else [0, 0, 0, 0]
+        self.spacing = spacing
+
+    def to_dict(self):
+        return {
+            "layout": self.layout,
+            "margins": list(self.margins),
+            "spacing": self.spacing
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            layout=data.get("layout"),
+            margins=data.get("margins"),
+            spacing=data.get("spacing")
+        )
+
+
+class TemplateNode(object):
+    """
+    Node of a template tree.
+
+    :param name: Unique name of the component.
+    :type name: str
+    :param type: Component type (canvas, container, text or image).
+    :type type: str
+    """
+    __slots__ = (
+        "name", "type", "component", "constraints", "styles", "properties",
+        "parent", "children", "document", "_row"
+    )
+
+    def __init__(self, name="", type="", component=None, constraints=None, styles=None, properties=None):
+        self.name = name
+        self.type = type
+        self.component = component if component is not None else Component()
+        self.constraints = constraints
+        self.styles = styles
+        self.properties = properties
+        self.parent = None
+        self.children = []
+        self.document = None
+        self._row = 0               # index among the siblings, kept by append and detach
+
+    def __repr__(self):
+        return "TemplateNode({!r}, {!r})".format(self.name, self.type)
+
+    @property
+    def kind(self):
+        """
+        Lowercase component type, as used by the loader and the renderers.
+        """
+        return self.type.lower()
+
+    def append(self, child):
+        """
+        Append ``child`` as the last child of this node, detaching it from its
+        previous parent first. Observers of the document are notified.
+        """
+        if child.parent is self:
+            return
+        child.detach()
+
+        document = self.document
+        row = len(self.children)
+        if document is not None:
+            document.notify("node_about_to_be_inserted", self, row, child)
+        child.parent = self
+        child._row = row
+        self.children.append(child)
+        if document is not None:
+            child._set_document(document)
+            document.notify("node_inserted", self, row, child)
+
+    def detach(self):
+        """
+        Remove this node (and its subtree) from its parent. Observers of the
+        document are notified.
+        """
+        parent = self.parent
+        if parent is None:
+            return
+
+        document = parent.document
+        row = self._row
+        if document is not None:
+            document.notify("node_about_to_be_removed", parent, row, self)
+        del parent.children[row]
+        for sibling in parent.children[row:]:
+            sibling._row -= 1
+        self.parent = None
+        self._row = 0
+        if document is not None:
+            self._set_document(None)
+            document.notify("node_removed", parent, row, self)
+
+    def row(self):
+        """
+        Index of this node among its siblings, in O(1).
+        """
+        return self._row
+
+    def _set_document(self, document):
+        for node in self.walk():
+            node.document = document
+
+    def ancestors(self):
+        parent = self.parent
+        while parent is not None:
+            yield parent
+            parent = parent.parent
+
+    @property
+    def depth(self):
+        return sum(1 for _ in self.ancestors())
+
+    def is_descendant_of(self, node):
+        """
+        Check whether ``node`` is a proper ancestor of this node in O(depth).
+        """
+        return any(ancestor is node for ancestor in self.ancestors())
+
+    def walk(self):
+        """
+        Iterate over this node and its descendants in preorder.
+        """
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    def to_dict(self):
+        """
+        Serialize the subtree rooted at this node to the JSON template format.
+
+        :rtype: dict
+        """
+        root_dict = None
+        stack = [(self, None)]
+        while stack:
+            node, siblings = stack.pop()
+            node_dict = {
+                "name": node.name,
+                "type": node.type,
+                "component": node.component.to_dict()
+            }
+            if node.constraints is not None:
+                node_dict["constraints"] = node.constraints.to_dict()
+            if node.properties is not None:
+                node_dict["properties"] = dict(node.properties)
+            if node.styles is not None:
+                node_dict["styles"] = dict(node.styles)
+            if node.children:
+                node_dict["children"] = []
+                for child in reversed(node.children):
+                    stack.append((child, node_dict["children"]))
+
+            if siblings is None:
+                root_dict = node_dict
+            else:
+                siblings.append(node_dict)
+        return root_dict
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Build a node tree from the JSON template format. The input is not modified.
+
+        :param data: Root node of the template.
+        :type data: dict
+        :rtype: TemplateNode
+        """
+        root = None
+        stack = [(data, None)]
+        while stack:
+            node_data, parent = stack.pop()
+            node_type = node_data.get("type", "")
+            default_size = DEFAULT_CANVAS_SIZE if node_type.lower() == "canvas" else DEFAULT_COMPONENT_SIZE
+            constraints = node_data.get("constraints")
+            styles = node_data.get("styles")
+            properties = node_data.get("properties")
+            node = cls(
+                name=node_data.get("name", ""),
+                type=node_type,
+                component=Component.from_dict(node_data.get("component", {}), default_size),
+                constraints=Constraints.from_dict(constraints) if constraints else None,
+                styles=dict(styles) if styles is not None else None,
+                properties=dict(properties) if properties is not None else None
+            )
+            if parent is None:
+                root = node
+            else:
+                node.parent = parent
+                node._row = len(parent.children)
+                parent.children.append(node)
+
+            for child_data in reversed(node_data.get("children", [])):
+                stack.append((child_data, node))
+        return root
+
+
+class TemplateDocument(object):
+    """
+    A template tree with a canvas node at its root.
+
+    Objects in ``observers`` are notified of structural changes through
+    ``node_about_to_be_inserted``, ``node_inserted``,
+    ``node_about_to_be_removed`` and ``node_removed``, each called with
+    ``(parent, row, node)``.
+    """
+    __slots__ = ("root", "observers")
+
+    def __init__(self, root=None):
+        self.root = root if root is not None else TemplateNode(
+            name="Canvas",
+            type="Canvas",
+            component=Component(size=DEFAULT_CANVAS_SIZE)
+        )
+        self.root._set_document(self)
+        self.observers = []
+
+    def notify(self, event, parent, row, node):
+        for observer in self.observers:
+            getattr(observer, event)(parent, row, node)
+
+    def __iter__(self):
+        return self.root.walk()
+
+    def __len__(self):
+        return sum(1 for _ in self.root.walk())
+
+    @property
+    def size(self):
+        return self.root.component.size
+
+    def to_dict(self):
+        return self.root.to_dict()
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(TemplateNode.from_dict(data))
@@ -0,0 +1,222 @@
+"""
+Headless batch rendering of JSON templates to PDF.
+
+    python -m app.render templates/ other/*.json -o out -j 4
+    python -m app.render invoice.json --data rows.csv --per-row --name "{{customer.id}}.pdf" -o out
+
+Run from the application directory, like the designer itself, so the
+templates find the bundled fonts and images.
+"""
+import os
+import sys
+import glob
+import json
+import math
+import time
+import argparse
+import traceback
+import logging
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+def find_templates(inputs):
+    """
+    Expand files, directories (their ``.json`` files) and glob patterns into
+    template paths, keeping the order they were given in and dropping duplicates.
+
+    :rtype: list(str)
+    """
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            matches = sorted(glob.glob(os.path.join(item, "*.json")))
+        elif os.path.isfile(item):
+            matches = [item]
+        else:
+            matches = sorted(glob.glob(item, recursive=True))
+        paths.extend(os.path.abspath(path) for path in matches if os.path.isfile(path))
+    return list(dict.fromkeys(paths))
+
+
+def output_path(path, output_dir=None):
+    filename = os.path.splitext(os.path.basename(path))[0] + ".pdf"
+    return os.path.join(output_dir if output_dir is not None else os.path.dirname(path), filename)
+
+
+def init_worker(log_level=logging.WARNING):
+    """
+    Worker process initializer: fonts are registered once per worker, and the
+    SVG drawing cache stays warm across the templates the worker renders.
+    """
+    logging.basicConfig(level=log_level, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    from app.io.fonts import font_registry
+    font_registry.preload()
+
+
+def render_template(path, output, image_dpi, jpeg_quality):
+    """
+    Render one template. Errors are returned instead of raised, so a broken
+    template does not cancel the batch.
+
+    :return: template path, output path, seconds and error (None on success).
+    :rtype: tuple
+    """
+    from app.io.export_code_to_pdf import export
+
+    start = time.perf_counter()
+    try:
+        with open(path, encoding="utf-8") as f:
+            template = json.load(f)
+        export(template, output, image_dpi=image_dpi, jpeg_quality=jpeg_quality)
+        error = None
+    except Exception:
+        error = traceback.format_exc()
+    return path, output, time.perf_counter() - start, error
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of ``values`` (``fraction`` between 0 and 1).
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m app.render",
+        description="Render ECW Designer JSON templates to PDF."
+    )
+    parser.add_argument("inputs", nargs="+", help="template files, directories or glob patterns")
+    parser.add_argument("-o", "--output-dir", help="output directory (next to each template by default)")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--dpi", type=int, default=None, help="resolution of the embedded raster images")
+    parser.add_argument("--original-images", action="store_true", help="embed the original image files")
+    parser.add_argument("--jpeg-quality", type=int, default=None, help="JPEG quality of the re-encoded photos")
+    parser.add_argument("--data", help="CSV or JSONL rows to merge into a single template")
+    parser.add_argument("--per-row", action="store_true", help="with --data, write one PDF per row")
+    parser.add_argument("--name", help="with --per-row, output file name pattern (placeholders allowed)")
+    parser.add_argument("--pages-per-file", type=int, default=None, help="with --data, split the output in files of this many pages")
+    parser.add_argument("--strict", action="store_true", help="with --data, fail on fields missing in a row")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log the export of every template")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    log_level = logging.INFO if args.verbose else logging.WARNING
+    logging.basicConfig(level=log_level, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+
+    from app.io.image_prep import DEFAULT_DPI, DEFAULT_JPEG_QUALITY
+    image_dpi = None if args.original_images else (args.dpi or DEFAULT_DPI)
+    jpeg_quality = args.jpeg_quality or DEFAULT_JPEG_QUALITY
+
+    paths = find_templates(args.inputs)
+    if not paths:
+        print("No templates found", file=sys.stderr)
+        return 2
+    if args.output_dir is not None:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    if args.data is not None:
+        if len(paths) != 1:
+            print("--data takes exactly one template", file=sys.stderr)
+            return 2
+        return merge_rows(paths[0], args, image_dpi, jpeg_quality)
+
+    outputs = {path: output_path(path, args.output_dir) for path in paths}
+    targets = dict()
+    for path, output in outputs.items():
+        targets.setdefault(output, []).append(path)
+    clashes = [(output, sources) for output, sources in targets.items() if len(sources) > 1]
+    if clashes:
+        for output, sources in clashes:
+            print("{} would be written by {}".format(output, ", ".join(sources)), file=sys.stderr)
+        print("Templates with the same name need different output directories", file=sys.stderr)
+        return 2
+
+    workers = max(1, min(args.workers, len(paths)))
+    latencies = []
+    failures = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(log_level,)) as executor:
+        futures = {
+            executor.submit(render_template, path, outputs[path], image_dpi, jpeg_quality): path
+            for path in paths
+        }
+        for future in as_completed(futures):
+            try:
+                path, output, seconds, error = future.result()
+            except Exception:
+                # The worker process died
+                path, error = futures[future], traceback.format_exc()
+            if error is None:
+                latencies.append(seconds)
+                print("{} -> {} ({:.0f} ms)".format(path, output, seconds * 1000))
+            else:
+                failures.append((path, error))
+                print("{} FAILED\n{}".format(path, error), file=sys.stderr)
+    elapsed = time.perf_counter() - start
+
+    print(
+        "{} rendered, {} failed in {:.2f} s with {} workers: {:.1f} docs/s, p50 {:.0f} ms, p95 {:.0f} ms".format(
+            len(latencies),
+            len(failures),
+            elapsed,
+            workers,
+            len(latencies) / elapsed if elapsed > 0 else 0.0,
+            percentile(latencies, .5) * 1000,
+            percentile(latencies, .95) * 1000
+        )
+    )
+    return 1 if failures else 0
+
+
+def merge_rows(path, args, image_dpi, jpeg_quality):
+    """
+    Render ``path`` once per row of ``args.data``, streaming the rows.
+    """
+    from app.io.fonts import font_registry
+    from app.io.merge import CompiledTemplate, iter_rows, merge
+
+    font_registry.preload()
+    if args.per_row and args.name:
+        filename = os.path.join(args.output_dir or os.path.dirname(path), args.name)
+    else:
+        filename = output_path(path, args.output_dir)
+
+    start = time.perf_counter()
+    try:
+        with open(path, encoding="utf-8") as f:
+            template = CompiledTemplate(json.load(f), strict=args.strict)
+        summary = merge(
+            template,
+            iter_rows(args.data),
+            filename,
+            per_row=args.per_row,
+            pages_per_file=args.pages_per_file,
+            image_dpi=image_dpi,
+            jpeg_quality=jpeg_quality
+        )
+    except Exception:
+        print("{} FAILED\n{}".format(path, traceback.format_exc()), file=sys.stderr)
+        return 1
+    elapsed = time.perf_counter() - start
+
+    print(
+        "{} rows, {} files in {:.2f} s: {:.1f} rows/s".format(
+            summary["rows"],
+            summary["files"],
+            elapsed,
+            summary["rows"] / elapsed if elapsed > 0 else 0.0
+        )
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""
+asyncio event loop running next to the Qt event loop.
+"""
+import asyncio
+import threading
+import logging
+logger = logging.getLogger(__name__)
+
+
+class AsyncLoopThread(threading.Thread):
+    """
+    Runs an asyncio event loop in a daemon thread, so coroutines (network
+    requests of the AI providers) never block the GUI thread.
+
+    Coroutines are scheduled with :meth:`submit`, which returns a
+    :class:`concurrent.futures.Future`: its done callbacks run in this
+    thread, so results must reach Qt through signals (queued connections).
+    """
+
+    def __init__(self, name="asyncio"):
+        super(AsyncLoopThread, self).__init__(name=name, daemon=True)
+        self.loop = asyncio.new_event_loop()
+        self.__ready = threading.Event()
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(self.__ready.set)
+        try:
+            self.loop.run_forever()
+        finally:
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self.loop.close()
+
+    def start(self):
+        super(AsyncLoopThread, self).start()
+        self.__ready.wait()
+
+    def submit(self, coro):
+        """
+        Schedule ``coro`` on the loop.
+
+        :rtype: concurrent.futures.Future
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def stop(self, timeout=None):
+        """
+        Cancel the pending coroutines and stop the loop.
+        """
+        if self.is_alive():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.join(timeout)
+
+
+_loop_thread = None
+_loop_lock = threading.Lock()
+
+
+def async_loop():
+    """
+    The shared event loop thread, started on first use.
+
+    :rtype: AsyncLoopThread
+    """
+    global _loop_thread
+    with _loop_lock:
+        if _loop_thread is None or not _loop_thread.is_alive():
+            _loop_thread = AsyncLoopThread()
+            _loop_thread.start()
+        return _loop_thread
@@ -1,10 +1,18 @@
+import os
 import re
+import asyncio
+import logging
+logger = logging.getLogger(__name__)
 
 from PyQt5 import QtCore
 
 from google import genai
 from google.genai import types
 
+from app.services.provider import BaseProvider, TextResponse, file_sha256
+from app.services.async_loop import async_loop
+from app.services.upload_registry import UploadRegistry
+
 
 SYSTEM_INSTRUCTIONS = """
 Your task is to generate a valid JSON string describing a UI template. Follow these rules strictly. Do not add extra fields. Do not omit mandatory ones.
@@ -166,21 +174,11 @@ Example snippet:
 """
 
 TIMEOUT_PROCESS = 60000
+MAX_RESPONSE_SIZE = 1000000
+MAX_CONVERSATION = 10
+MAX_REMEMBERED_RESPONSE = 10000
 
 
-class FakeResponse(types.GenerateContentResponse):
-    def __init__(self, text=""):
-        super(FakeResponse, self).__init__()
-        self.__text = text
-        
-    @property
-    def text(self):
-        return self.__text
-    
-    @text.setter
-    def text(self, value):
-        self.__text = value
-
 def sort_gemini_models(model_list):
     """
     Sort list of Gemini models.
@@ -207,141 +205,51 @@ def sort_gemini_models(model_list):
     return main_versions_sorted + exp_pro_sorted
 
 
-class UploadWorker(QtCore.QThread):
-    upload_finished = QtCore.pyqtSignal(types.File, str)
-    upload_failed = QtCore.pyqtSignal(str, str)
-    def __init__(self, client):
-        super(UploadWorker, self).__init__()
-        self.__client = client
-        self.file = None
-        self.filename = ""
-
-    @property
-    def client(self):
-        return self.__client
-    
-    @client.setter
-    def client(self, client):
-        self.__client = client
-
-    def run(self):
-        try:
-            file = self.__client.files.upload(file=self.file)
-            self.upload_finished.emit(file, self.filename)
-        except Exception as e:
-            self.upload_failed.emit(type(e).__name__, str(e))
-
-class QueryWorker(QtCore.QThread):
-    query_finished = QtCore.pyqtSignal(types.GenerateContentResponse)
-    query_failed = QtCore.pyqtSignal(str, str)
-    def __init__(self, client, model, config):
-        super(QueryWorker, self).__init__()
-        self.__client = client
-        self.__model = model
-        self.__config = config
-        self.conversation = []
-        self.prompt = ""
-        self.__generating_content = False
-        self._abort = False  # Add abort flag
-
-    @property
-    def client(self):
-        return self.__client
-    
-    @client.setter
-    def client(self, client):
-        self.__client = client
-
-    @property
-    def model(self):
-        return self.__model
-    
-    @model.setter
-    def model(self, model):
-        self.__model = model
-
-    @property
-    def generating_content(self):
-        return self.__generating_content
+class Gemini(BaseProvider):
+    """
+    Template generation with the Gemini API.
 
-    def abort(self):
-        self._abort = True
+    Requests run as coroutines of the async client on the shared asyncio loop
+    (see :func:`async_loop`), so any number of uploads and queries can be in
+    flight at once. Their results come back to the GUI thread through queued
+    signals, and :meth:`cancel` cancels the coroutine at its next await. A
+    request fails with a timeout when the API stays silent for
+    ``TIMEOUT_PROCESS`` milliseconds.
 
-    def run(self):
-        try:
-            self.__generating_content = False
-            self._abort = False
-
-            # Limit conversation size to avoid memory issues
-            max_conv = 10
-            if len(self.conversation) > max_conv:
-                self.conversation = self.conversation[-max_conv:]
-
-            # Ensure prompt is a list (if not, convert)
-            if isinstance(self.prompt, str):
-                prompt_list = [self.prompt]
-            else:
-                prompt_list = list(self.prompt)
-
-            self.conversation.extend(prompt_list)
-
-            response = self.__client.models.generate_content_stream(
-                model=self.__model,
-                contents=self.conversation,
-                config=self.__config
-            )
+    Local files already uploaded with the same content are not uploaded again
+    while the remote file is still available (see :class:`UploadRegistry`).
 
-            _response = FakeResponse()
-            for chunk in response:
-                if self._abort:
-                    self.query_failed.emit("Aborted", "Query was aborted by user.")
-                    return
-                if not self.__generating_content:
-                    self.__generating_content = True
-                # Avoid building huge strings in memory
-                if len(_response.text) > 1000000:  # 1MB limit
-                    self.query_failed.emit("MemoryError", "Response too large.")
-                    return
-                _response.text += chunk.text
-
-            # Limit conversation history growth
-            self.conversation.append("ModelResponse: " + (_response.text[:10000] if len(_response.text) > 10000 else _response.text))
-
-            self.query_finished.emit(_response)
-        except Exception as e:
-            self.query_failed.emit(type(e).__name__, str(e))
+    :param upload_registry: Upload registry, True for the default one or False for none.
+    :type upload_registry: UploadRegistry or bool
+    """
+    name = "gemini"
 
+    _chunk_received = QtCore.pyqtSignal(int, str)
+    _request_done = QtCore.pyqtSignal(int, object)
 
-class Gemini(QtCore.QObject):
-    query_finished = QtCore.pyqtSignal(types.GenerateContentResponse)
-    upload_finished = QtCore.pyqtSignal(types.File, str)
-    process_failed = QtCore.pyqtSignal(str, str)
-    def __init__(self, api_key, model="gemini-2.0-flash-thinking-exp", *args, **kwargs):
+    def __init__(self, api_key, model="gemini-2.0-flash-thinking-exp", upload_registry=True, *args, **kwargs):
         super(Gemini, self).__init__(*args, **kwargs)
 
-        client = genai.Client(api_key=api_key) if api_key is not None else None
-
-        content_config = types.GenerateContentConfig(
+        self.client = genai.Client(api_key=api_key) if api_key is not None else None
+        self.model = model
+        self.content_config = types.GenerateContentConfig(
             temperature=0,
             system_instruction=SYSTEM_INSTRUCTIONS
         )
-        self.query_worker = QueryWorker(client, model, content_config)
-        self.upload_worker = UploadWorker(client)
-
-        self.query_worker.query_finished.connect(self.on_query_finished)
-        self.query_worker.query_failed.connect(self.on_process_failed)
-
-        self.upload_worker.upload_finished.connect(self.on_upload_file_finished)
-        self.upload_worker.upload_failed.connect(self.on_process_failed)
-
-        self.monitor_process = QtCore.QTimer()
-        self.monitor_process.setSingleShot(True)
+        if isinstance(upload_registry, UploadRegistry):
+            self.upload_registry = upload_registry
+        else:
+            self.upload_registry = UploadRegistry() if upload_registry else None
+        self.conversation = []
+        self.__file_hashes = dict()     # uploaded file name -> local content hash
+        self.__futures = dict()         # request id -> (future, kind, context)
 
-        self.monitor_process.timeout.connect(self.on_monitor_process_timeout)
+        self._chunk_received.connect(self.on_query_chunk)
+        self._request_done.connect(self.__on_request_done)
 
     def get_available_models(self):
         available_models = []
-        for _model in self.query_worker.client.models.list():
+        for _model in self.client.models.list():
             if (
                 "gemini" in _model.name.lower() and
                 _model.output_token_limit > 1 and
@@ -353,51 +261,156 @@ class Gemini(QtCore.QObject):
         return sort_gemini_models(available_models)
     
     def update_api_key(self, api_key):
-        client = genai.Client(api_key=api_key)
-        self.query_worker.client = client
-        self.upload_worker.client = client
-        
-    def query(self, model, prompt):
-        self.query_worker.model = model
-        self.query_worker.prompt = prompt
-
-        self.query_worker.start()
-        self.monitor_process.start(TIMEOUT_PROCESS)
-    
-    @QtCore.pyqtSlot(types.GenerateContentResponse)
-    def on_query_finished(self, response):
-        self.query_finished.emit(response)
-        self.monitor_process.stop()
-
-    def upload_file(self, file, filename):
-        self.upload_worker.file = file
-        self.upload_worker.filename = filename
-
-        self.upload_worker.start()
-        self.monitor_process.start(TIMEOUT_PROCESS)
-
-    @QtCore.pyqtSlot(types.File, str)
-    def on_upload_file_finished(self, file, filename):
-        self.upload_finished.emit(file, filename)
-        self.monitor_process.stop()
-
-    @QtCore.pyqtSlot()
-    def on_monitor_process_timeout(self):
-        if self.query_worker.isRunning():
-            # print("Query worker is running. Interrupting...")
-            if self.query_worker.generating_content:
-                self.monitor_process.start(TIMEOUT_PROCESS)
-                return
-            self.query_worker.terminate()
-        elif self.upload_worker.isRunning():
-            # print("Upload worker is running. Interrupting...")
-            self.upload_worker.terminate()
-        
-        self.process_failed.emit(
-            "Timeout",
-            "The process timed out after {0} seconds.".format(TIMEOUT_PROCESS)
-        )
+        # Requests in flight finish with the client they started with
+        self.client = genai.Client(api_key=api_key)
 
-    @QtCore.pyqtSlot(str, str)
-    def on_process_failed(self, error_type, content):
-        self.process_failed.emit(error_type, content)
+    def query_signature(self):
+        try:
+            config = self.content_config.model_dump(mode="json", exclude_none=True)
+        except AttributeError:
+            config = repr(self.content_config)
+        return [self.name, SYSTEM_INSTRUCTIONS, config]
+
+    def file_hash(self, file):
+        """
+        Content hash of an uploaded file: the hash of the local file when it was
+        uploaded in this session, the one reported by the API otherwise.
+        """
+        return self.__file_hashes.get(getattr(file, "name", None)) or super(Gemini, self).file_hash(file)
+
+    def contents(self, prompt):
+        """
+        What is sent to the model for ``prompt``: the conversation so far, then
+        the prompt.
+
+        :rtype: list
+        """
+        return self.conversation + ([prompt] if isinstance(prompt, str) else list(prompt))
+
+    def cache_key(self, model, prompt):
+        # The same prompt in another conversation asks for something else
+        return super(Gemini, self).cache_key(model, self.contents(prompt))
+
+    def remember(self, prompt, text):
+        """
+        Add an exchange to the conversation sent with the next prompts.
+        """
+        self.conversation.extend([prompt] if isinstance(prompt, str) else list(prompt))
+        self.conversation.append("ModelResponse: " + text[:MAX_REMEMBERED_RESPONSE])
+        # Limit conversation size to avoid memory issues
+        del self.conversation[:-MAX_CONVERSATION]
+
+    def start_query(self, request_id, model, prompt):
+        # Each query sees the conversation as it was when it was sent
+        contents = self.contents(prompt)
+        self.__submit(request_id, "query", prompt, self.__generate(self.client, request_id, model, contents))
+
+    def start_upload(self, request_id, file, filename):
+        self.__submit(request_id, "upload", filename, self.__upload(self.client, file))
+
+    def stop_request(self, request_id):
+        entry = self.__futures.get(request_id)
+        if entry is not None:
+            entry[0].cancel()
+
+    def __submit(self, request_id, kind, context, coro):
+        future = async_loop().submit(coro)
+        self.__futures[request_id] = (future, kind, context)
+        # Runs in the loop thread: the signal queues the result to the GUI thread
+        future.add_done_callback(lambda f: self._request_done.emit(request_id, f))
+
+    async def __generate(self, client, request_id, model, contents):
+        timeout = TIMEOUT_PROCESS / 1000
+        stream = await asyncio.wait_for(
+            client.aio.models.generate_content_stream(
+                model=model,
+                contents=contents,
+                config=self.content_config
+            ),
+            timeout
+        )
+        chunks = stream.__aiter__()
+        text = ""
+        while True:
+            try:
+                chunk = await asyncio.wait_for(chunks.__anext__(), timeout)
+            except StopAsyncIteration:
+                break
+            chunk_text = chunk.text or ""
+            if not chunk_text:
+                continue
+            text += chunk_text
+            # Avoid building huge strings in memory
+            if len(text) > MAX_RESPONSE_SIZE:
+                raise MemoryError("Response too large.")
+            self._chunk_received.emit(request_id, chunk_text)
+        return TextResponse(text)
+
+    async def __upload(self, client, file):
+        sha256_hash = None
+        if isinstance(file, str):
+            loop = asyncio.get_running_loop()
+            sha256_hash = await loop.run_in_executor(None, file_sha256, file)
+            if self.upload_registry is not None:
+                uploaded = await self.__registered_file(client, sha256_hash)
+                if uploaded is not None:
+                    self.upload_registry.record_reuse(os.path.getsize(file))
+                    logger.debug("Reusing upload {} for {}".format(uploaded.name, file))
+                    return uploaded, sha256_hash
+
+        uploaded = await asyncio.wait_for(client.aio.files.upload(file=file), TIMEOUT_PROCESS / 1000)
+        if sha256_hash is not None and self.upload_registry is not None:
+            expiration_time = getattr(uploaded, "expiration_time", None)
+            self.upload_registry.put(
+                sha256_hash,
+                uploaded.name,
+                os.path.getsize(file),
+                uri=uploaded.uri,
+                expires=expiration_time.timestamp() if expiration_time is not None else None
+            )
+        return uploaded, sha256_hash
+
+    async def __registered_file(self, client, sha256_hash):
+        """
+        The remote file registered for a content hash, if the API still has it.
+        """
+        entry = self.upload_registry.get(sha256_hash)
+        if entry is None:
+            return None
+        try:
+            uploaded = await asyncio.wait_for(client.aio.files.get(name=entry["name"]), TIMEOUT_PROCESS / 1000)
+        except Exception as e:
+            # Deleted, expired early or uploaded with another API key
+            logger.debug("Upload {} not available: {}".format(entry["name"], e))
+            uploaded = None
+        if uploaded is None or uploaded.state == types.FileState.FAILED:
+            self.upload_registry.discard(sha256_hash)
+            return None
+        return uploaded
+
+    @QtCore.pyqtSlot(int, object)
+    def __on_request_done(self, request_id, future):
+        entry = self.__futures.pop(request_id, None)
+        if entry is None or future.cancelled():
+            return
+        _, kind, context = entry
+
+        error = future.exception()
+        if isinstance(error, asyncio.TimeoutError):
+            self.on_process_failed(
+                request_id,
+                "Timeout",
+                "The process timed out after {0} seconds.".format(TIMEOUT_PROCESS // 1000)
+            )
+        elif error is not None:
+            self.on_process_failed(request_id, type(error).__name__, str(error))
+        elif kind == "query":
+            response = future.result()
+            if self.is_active(request_id):
+                self.remember(context, response.text)
+            self.on_query_finished(request_id, response)
+        else:
+            file, sha256_hash = future.result()
+            if sha256_hash is not None:
+                self.__file_hashes[file.name] = sha256_hash
+            self.on_upload_file_finished(request_id, file, context)
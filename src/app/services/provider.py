@@ -0,0 +1,265 @@
+import os
+import time
+import itertools
+import hashlib
+import logging
+logger = logging.getLogger(__name__)
+
+from PyQt5 import QtCore
+
+from app.services.response_cache import ResponseCache
+
+
+PROVIDER_ENV = "ECW_PROVIDER"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path):
+    """
+    Content hash of a local file.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class TextResponse(object):
+    """
+    Response of a provider: only its text is used.
+    """
+    __slots__ = ("text",)
+
+    def __init__(self, text=""):
+        self.text = text
+
+
+class BaseProvider(QtCore.QObject):
+    """
+    Template generation backend.
+
+    Every :meth:`query` and :meth:`upload_file` is a request with its own id,
+    and several of them can be in flight at once. Subclasses implement
+    :meth:`start_query` (and :meth:`start_upload` if they accept attachments)
+    and report back through :meth:`on_query_chunk`, :meth:`on_query_finished`,
+    :meth:`on_upload_file_finished` and :meth:`on_process_failed`; reports of
+    a request that was canceled or already finished are dropped. Unless
+    ``cache`` is False, responses are cached on disk by :meth:`query`. The
+    latency of the last finished query is kept in ``last_timings``. Providers
+    that avoid uploading the same file twice keep their
+    :class:`UploadRegistry` in ``upload_registry``.
+
+    :param cache: Response cache, True for the default one or False for none.
+    :type cache: ResponseCache or bool
+
+    Señales:
+        query_chunk(str): next piece of the response being generated
+        query_finished(object): response, with its ``text``
+        upload_finished(object, str): uploaded file and its name
+        process_failed(str, str): error type and message
+        request_chunk(int, str): same as query_chunk, with the request id
+        request_finished(int, object): response or uploaded file of a request
+        request_failed(int, str, str): request id, error type and message
+    """
+    query_chunk = QtCore.pyqtSignal(str)
+    query_finished = QtCore.pyqtSignal(object)
+    upload_finished = QtCore.pyqtSignal(object, str)
+    process_failed = QtCore.pyqtSignal(str, str)
+    request_chunk = QtCore.pyqtSignal(int, str)
+    request_finished = QtCore.pyqtSignal(int, object)
+    request_failed = QtCore.pyqtSignal(int, str, str)
+
+    name = "base"
+
+    def __init__(self, cache=True, parent=None):
+        super(BaseProvider, self).__init__(parent)
+        if isinstance(cache, ResponseCache):
+            self.response_cache = cache
+        else:
+            self.response_cache = ResponseCache() if cache else None
+        self.upload_registry = None
+        self.last_timings = dict()
+        self.__request_ids = itertools.count(1)
+        self.__requests = dict()    # request id -> {"key", "start", "timings"}
+
+    def get_available_models(self):
+        raise NotImplementedError
+
+    def update_api_key(self, api_key):
+        pass
+
+    def query_signature(self):
+        """
+        Everything besides the model and the prompt that determines a response
+        (system instructions, generation config...), for the cache key.
+        """
+        return [self.name]
+
+    def file_hash(self, file):
+        """
+        Content hash of an attached file, for the cache key.
+        """
+        return (
+            getattr(file, "sha256_hash", None) or
+            getattr(file, "uri", None) or
+            str(file)
+        )
+
+    def cache_key(self, model, prompt):
+        """
+        Response cache key of a query: model, :meth:`query_signature`, prompt
+        text and content hash of the attached files.
+        """
+        parts = []
+        for part in ([prompt] if isinstance(prompt, str) else prompt):
+            if isinstance(part, str):
+                parts.append(["text", part])
+            else:
+                parts.append(["file", self.file_hash(part)])
+        return ResponseCache.make_key(model, self.query_signature(), parts)
+
+    def remember(self, prompt, text):
+        """
+        Called when ``prompt`` is answered from the cache, for providers that
+        keep a conversation.
+        """
+        pass
+
+    def in_flight(self):
+        """
+        Ids of the requests not finished yet.
+
+        :rtype: list(int)
+        """
+        return list(self.__requests)
+
+    def is_active(self, request_id):
+        return request_id in self.__requests
+
+    def __new_request(self, key=None):
+        request_id = next(self.__request_ids)
+        self.__requests[request_id] = {"key": key, "start": time.perf_counter(), "timings": dict()}
+        return request_id
+
+    def query(self, model, prompt, bypass_cache=False):
+        """
+        Send ``prompt`` to ``model``. A response cached for the same query is
+        returned without calling the backend, unless ``bypass_cache`` is set;
+        the response is then asynchronous as well.
+
+        :return: Request id, for :meth:`cancel`.
+        :rtype: int
+        """
+        if self.response_cache is None:
+            request_id = self.__new_request()
+            self.start_query(request_id, model, prompt)
+            return request_id
+
+        key = self.cache_key(model, prompt)
+        if not bypass_cache:
+            text = self.response_cache.get(key)
+            if text is not None:
+                logger.debug("Response cache hit: {}".format(self.response_cache.stats()))
+                request_id = self.__new_request()
+                self.remember(prompt, text)
+                QtCore.QTimer.singleShot(
+                    0, lambda: self.on_query_finished(request_id, TextResponse(text), cache=False)
+                )
+                return request_id
+
+        request_id = self.__new_request(key)
+        self.start_query(request_id, model, prompt)
+        return request_id
+
+    def upload_file(self, file, filename):
+        """
+        Upload ``file`` to attach it to the next prompts.
+
+        :return: Request id, for :meth:`cancel`.
+        :rtype: int
+        """
+        request_id = self.__new_request()
+        self.start_upload(request_id, file, filename)
+        return request_id
+
+    def cancel(self, request_id):
+        """
+        Stop a request: nothing is reported for it anymore.
+        """
+        if self.__requests.pop(request_id, None) is not None:
+            logger.debug("Request {} canceled ({})".format(request_id, self.name))
+            self.stop_request(request_id)
+
+    @QtCore.pyqtSlot()
+    def cancel_all(self):
+        for request_id in self.in_flight():
+            self.cancel(request_id)
+
+    def start_query(self, request_id, model, prompt):
+        raise NotImplementedError
+
+    def start_upload(self, request_id, file, filename):
+        message = "{} does not accept attachments.".format(type(self).__name__)
+        QtCore.QTimer.singleShot(
+            0, lambda: self.on_process_failed(request_id, "NotImplementedError", message)
+        )
+
+    def stop_request(self, request_id):
+        """
+        Release the work of a canceled request.
+        """
+        pass
+
+    @QtCore.pyqtSlot(int, str)
+    def on_query_chunk(self, request_id, text):
+        request = self.__requests.get(request_id)
+        if request is None:
+            return
+        if "first_chunk" not in request["timings"]:
+            request["timings"]["first_chunk"] = time.perf_counter() - request["start"]
+        self.request_chunk.emit(request_id, text)
+        self.query_chunk.emit(text)
+
+    @QtCore.pyqtSlot(int, object)
+    def on_query_finished(self, request_id, response, cache=True):
+        request = self.__requests.pop(request_id, None)
+        if request is None:
+            return
+        if cache and request["key"] is not None and response.text:
+            self.response_cache.put(request["key"], response.text, provider=self.name)
+        request["timings"]["finished"] = time.perf_counter() - request["start"]
+        self.last_timings = request["timings"]
+        logger.debug("Query {} timings ({}): {}".format(request_id, self.name, self.last_timings))
+        self.request_finished.emit(request_id, response)
+        self.query_finished.emit(response)
+
+    @QtCore.pyqtSlot(int, object, str)
+    def on_upload_file_finished(self, request_id, file, filename):
+        if self.__requests.pop(request_id, None) is None:
+            return
+        self.request_finished.emit(request_id, file)
+        self.upload_finished.emit(file, filename)
+
+    @QtCore.pyqtSlot(int, str, str)
+    def on_process_failed(self, request_id, error_type, content):
+        if self.__requests.pop(request_id, None) is None:
+            return
+        self.request_failed.emit(request_id, error_type, content)
+        self.process_failed.emit(error_type, content)
+
+
+def create_provider(api_key=None):
+    """
+    Create the template generation backend selected by the ``ECW_PROVIDER``
+    environment variable: ``gemini`` (default) or ``replay`` (offline, see
+    :class:`ReplayProvider`).
+    """
+    name = os.environ.get(PROVIDER_ENV, "gemini").lower()
+    if name == "replay":
+        from app.services.replay import ReplayProvider
+        return ReplayProvider.from_environment()
+    if name != "gemini":
+        logger.warning("Unknown provider {}, using gemini".format(name))
+    from app.services.gemini import Gemini
+    return Gemini(api_key=api_key)
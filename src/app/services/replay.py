@@ -0,0 +1,250 @@
+import os
+import json
+import random
+import hashlib
+import logging
+logger = logging.getLogger(__name__)
+
+from PyQt5 import QtCore
+
+from app.services.provider import BaseProvider, TextResponse, file_sha256
+
+
+REPLAY_SOURCE_ENV = "ECW_REPLAY_SOURCE"
+REPLAY_CHUNK_SIZE_ENV = "ECW_REPLAY_CHUNK_SIZE"
+REPLAY_CHUNK_DELAY_ENV = "ECW_REPLAY_CHUNK_DELAY_MS"
+REPLAY_LATENCY_ENV = "ECW_REPLAY_LATENCY_MS"
+REPLAY_NODES_ENV = "ECW_REPLAY_NODES"
+
+DEFAULT_CHUNK_SIZE = 64
+DEFAULT_CHUNK_DELAY_MS = 20
+DEFAULT_LATENCY_MS = 500
+DEFAULT_NODES = 30
+
+PLACEHOLDER_IMAGE = "assets/images/placeholder.svg"
+
+
+class ReplayFile(object):
+    """
+    Attachment accepted by :class:`ReplayProvider`.
+    """
+    __slots__ = ("name", "path", "sha256_hash")
+
+    def __init__(self, name, path, sha256_hash):
+        self.name = name
+        self.path = path
+        self.sha256_hash = sha256_hash
+
+
+def synthetic_template(nodes=DEFAULT_NODES, seed=0):
+    """
+    A template in the format the model is asked for: a canvas with rows of
+    containers holding text and image nodes, about ``nodes`` nodes in total.
+    The same seed always gives the same template.
+
+    :rtype: dict
+    """
+    rng = random.Random(seed)
+    width, height = 1000, 1000
+    rows = max(1, round((nodes / 3) ** .5))
+    columns = max(1, -(-nodes // (3 * rows)))
+    margin, spacing = 20, 10
+    cell_w = (width - 2 * margin - (columns - 1) * spacing) // columns
+    cell_h = (height - 2 * margin - (rows - 1) * spacing) // rows
+
+    styles = lambda: {
+        "shape": rng.choice(("rect", "rounded_rect")),
+        "edge_color": "#000000ff",
+        "fill_color": "#{:06x}ff".format(rng.randrange(0x1000000)),
+        "line_width": 1,
+        "radius": 5
+    }
+    children = []
+    count = 1
+    for row in range(rows):
+        for column in range(columns):
+            if count >= nodes:
+                break
+            index = len(children)
+            container = {
+                "name": "container_{}".format(index),
+                "type": "container",
+                "component": {
+                    "pos": [margin + column * (cell_w + spacing), margin + row * (cell_h + spacing)],
+                    "size": [cell_w, cell_h],
+                    "size_policy": ["fixed", "fixed"]
+                },
+                "styles": styles(),
+                "children": []
+            }
+            count += 1
+            for kind in ("text", "image"):
+                if count >= nodes:
+                    break
+                child = {
+                    "name": "{}_{}".format(kind, index),
+                    "type": kind,
+                    "component": {
+                        "pos": [10, 10 if kind == "text" else cell_h // 2],
+                        "size": [max(1, cell_w - 20), max(1, cell_h // 2 - 20)],
+                        "size_policy": ["fixed", "fixed"]
+                    }
+                }
+                if kind == "text":
+                    child["properties"] = {
+                        "text": "Lorem ipsum {}".format(rng.randrange(1000)),
+                        "font": "Times New Roman",
+                        "font_size": rng.choice((12, 16, 24)),
+                        "font_color": "#000000",
+                        "ha": "center",
+                        "va": "center"
+                    }
+                else:
+                    child["properties"] = {
+                        "path": PLACEHOLDER_IMAGE,
+                        "keep_aspect_ratio": True,
+                        "scale": "fit",
+                        "ha": "center",
+                        "va": "center"
+                    }
+                container["children"].append(child)
+                count += 1
+            children.append(container)
+
+    return {
+        "name": "canvas",
+        "type": "canvas",
+        "component": {
+            "pos": [0, 0],
+            "size": [width, height],
+            "size_policy": ["fixed", "fixed"]
+        },
+        "children": children
+    }
+
+
+class ReplayProvider(BaseProvider):
+    """
+    Offline stand-in for the model: streams a recorded or synthetic response
+    in chunks of ``chunk_size`` characters, one every ``chunk_delay``
+    milliseconds after an initial ``latency``. It needs no network access and
+    is deterministic, so the generate, parse and load pipeline can be timed
+    and load-tested anywhere.
+
+    ``source`` is a response file (plain text, or an entry of the response
+    cache), or a directory of them replayed in turn. Without a source, a
+    synthetic template of ``nodes`` nodes is generated from the prompt.
+
+    Responses are not cached unless ``cache`` is given.
+    """
+    name = "replay"
+
+    def __init__(self, source=None, chunk_size=DEFAULT_CHUNK_SIZE, chunk_delay=DEFAULT_CHUNK_DELAY_MS,
+                 latency=DEFAULT_LATENCY_MS, nodes=DEFAULT_NODES, cache=False, parent=None):
+        super(ReplayProvider, self).__init__(cache=cache, parent=parent)
+        self.source = source
+        self.chunk_size = max(1, chunk_size)
+        self.chunk_delay = max(0, chunk_delay)
+        self.latency = max(0, latency)
+        self.nodes = nodes
+        self.__replayed = 0
+        self.__streams = dict()     # request id -> [text, position, timer]
+
+    @classmethod
+    def from_environment(cls):
+        environ = os.environ
+        return cls(
+            source=environ.get(REPLAY_SOURCE_ENV) or None,
+            chunk_size=int(environ.get(REPLAY_CHUNK_SIZE_ENV, DEFAULT_CHUNK_SIZE)),
+            chunk_delay=int(environ.get(REPLAY_CHUNK_DELAY_ENV, DEFAULT_CHUNK_DELAY_MS)),
+            latency=int(environ.get(REPLAY_LATENCY_ENV, DEFAULT_LATENCY_MS)),
+            nodes=int(environ.get(REPLAY_NODES_ENV, DEFAULT_NODES))
+        )
+
+    def get_available_models(self):
+        return [self.name]
+
+    def response_text(self, prompt):
+        """
+        The response replayed for ``prompt``.
+
+        :rtype: str
+        """
+        if self.source is None:
+            text = prompt if isinstance(prompt, str) else " ".join(p for p in prompt if isinstance(p, str))
+            seed = int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+            return "```json\n{}\n```".format(json.dumps(synthetic_template(self.nodes, seed), indent=4))
+
+        path = self.source
+        if os.path.isdir(path):
+            names = sorted(name for name in os.listdir(path) if os.path.isfile(os.path.join(path, name)))
+            if not names:
+                raise FileNotFoundError("No responses in {}".format(path))
+            path = os.path.join(path, names[self.__replayed % len(names)])
+        self.__replayed += 1
+
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        try:
+            entry = json.loads(text)
+        except ValueError:
+            return text
+        # A response cache entry
+        if isinstance(entry, dict) and isinstance(entry.get("text"), str) and "created" in entry:
+            return entry["text"]
+        return text
+
+    def start_query(self, request_id, model, prompt):
+        try:
+            text = self.response_text(prompt)
+        except OSError as e:
+            error = (type(e).__name__, str(e))
+            QtCore.QTimer.singleShot(0, lambda: self.on_process_failed(request_id, *error))
+            return
+        timer = QtCore.QTimer(self)
+        timer.setSingleShot(True)
+        timer.timeout.connect(lambda: self.__emit_chunk(request_id))
+        self.__streams[request_id] = [text, 0, timer]
+        timer.start(self.latency)
+
+    def __emit_chunk(self, request_id):
+        stream = self.__streams.get(request_id)
+        if stream is None:
+            return
+        text, position, timer = stream
+        if position >= len(text):
+            self.__release(request_id)
+            self.on_query_finished(request_id, TextResponse(text))
+            return
+        chunk = text[position:position + self.chunk_size]
+        stream[1] = position + len(chunk)
+        self.on_query_chunk(request_id, chunk)
+        if request_id in self.__streams:
+            timer.start(self.chunk_delay)
+
+    def start_upload(self, request_id, file, filename):
+        try:
+            sha256_hash = file_sha256(file)
+        except (OSError, TypeError) as e:
+            error = (type(e).__name__, str(e))
+            QtCore.QTimer.singleShot(0, lambda: self.on_process_failed(request_id, *error))
+            return
+        upload = ReplayFile(filename, file, sha256_hash)
+        timer = QtCore.QTimer(self)
+        timer.setSingleShot(True)
+        timer.timeout.connect(lambda: self.__finish_upload(request_id, upload, filename))
+        self.__streams[request_id] = [None, 0, timer]
+        timer.start(self.latency)
+
+    def __finish_upload(self, request_id, upload, filename):
+        self.__release(request_id)
+        self.on_upload_file_finished(request_id, upload, filename)
+
+    def stop_request(self, request_id):
+        self.__release(request_id)
+
+    def __release(self, request_id):
+        stream = self.__streams.pop(request_id, None)
+        if stream is not None:
+            stream[2].stop()
+            stream[2].deleteLater()
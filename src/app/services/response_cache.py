@@ -0,0 +1,144 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import logging
+logger = logging.getLogger(__name__)
+
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".ecw_designer", "responses")
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class ResponseCache(object):
+    """
+    Disk cache of model responses, one JSON file per key.
+
+    Entries expire ``ttl`` seconds after they are stored, and the least
+    recently used ones (the file modification time is refreshed on every hit)
+    are evicted beyond ``max_entries`` or ``max_bytes``. Hits and misses are
+    counted for the current session.
+
+    :param directory: Cache directory, created on first write.
+    :type directory: str
+    :param ttl: Lifetime of an entry in seconds.
+    :type ttl: int
+    """
+
+    def __init__(self, directory=CACHE_DIR, ttl=DEFAULT_TTL_SECONDS,
+                 max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(*parts):
+        """
+        Hash of ``parts`` (any JSON serializable values).
+
+        :rtype: str
+        """
+        data = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def __path(self, key):
+        return os.path.join(self.directory, "{}.json".format(key))
+
+    def get(self, key):
+        """
+        :return: The cached response text, or None.
+        :rtype: str or None
+        """
+        path = self.__path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+            if time.time() - entry["created"] > self.ttl:
+                os.remove(path)
+                raise KeyError(key)
+            os.utime(path)
+        except (OSError, ValueError, KeyError, TypeError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry["text"]
+
+    def put(self, key, text, **metadata):
+        entry = dict(metadata, created=time.time(), text=text)
+        path = self.__path(key)
+        temp_path = "{}.{}.tmp".format(path, uuid.uuid4().hex)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning("Could not cache response: {}".format(e))
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return
+        self.evict()
+
+    def evict(self):
+        """
+        Drop expired entries, then the least recently used ones beyond the limits.
+        """
+        now = time.time()
+        entries = []
+        for stat, path in self.__entries():
+            # An entry is never used after its TTL, and its mtime is at least its creation time
+            if now - stat.st_mtime > self.ttl:
+                self.__remove(path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        while entries and (len(entries) > self.max_entries or total > self.max_bytes):
+            _, size, path = entries.pop(0)
+            self.__remove(path)
+            total -= size
+
+    def clear(self):
+        for _, path in self.__entries():
+            self.__remove(path)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        entries = list(self.__entries())
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(entries),
+            "bytes": sum(stat.st_size for stat, _ in entries)
+        }
+
+    def __entries(self):
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                yield os.stat(path), path
+            except OSError:
+                continue
+
+    @staticmethod
+    def __remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
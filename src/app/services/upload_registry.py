@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import uuid
+import threading
+import logging
+logger = logging.getLogger(__name__)
+
+
+REGISTRY_PATH = os.path.join(os.path.expanduser("~"), ".ecw_designer", "uploads.json")
+# Uploaded files are kept by the API for 48 hours
+DEFAULT_FILE_TTL_SECONDS = 47 * 60 * 60
+# A file about to expire is uploaded again rather than used in a query
+DEFAULT_EXPIRY_MARGIN_SECONDS = 10 * 60
+
+
+class UploadRegistry(object):
+    """
+    Persistent map from the content hash of a local file to the remote file it
+    was uploaded as, so attaching the same file again (in this or a later
+    session) reuses the upload while it has not expired.
+
+    Entries are kept in a single JSON file, rewritten atomically on every
+    change. The bytes not uploaded thanks to the registry are counted for the
+    session and in total.
+
+    :param path: Registry file, created on first write.
+    :type path: str
+    :param expiry_margin: Seconds before its expiration a remote file stops being reused.
+    :type expiry_margin: int
+    """
+
+    def __init__(self, path=REGISTRY_PATH, expiry_margin=DEFAULT_EXPIRY_MARGIN_SECONDS):
+        self.path = path
+        self.expiry_margin = expiry_margin
+        self.uploads = 0
+        self.reused = 0
+        self.bytes_saved = 0
+        self.__entries = None
+        self.__total_bytes_saved = 0
+        self.__lock = threading.Lock()
+
+    def __load(self):
+        if self.__entries is not None:
+            return
+        self.__entries = dict()
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.__entries = dict(data["files"])
+            self.__total_bytes_saved = int(data.get("bytes_saved", 0))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning("Ignoring upload registry {}: {}".format(self.path, e))
+
+    def __save(self):
+        data = {"files": self.__entries, "bytes_saved": self.__total_bytes_saved}
+        temp_path = "{}.{}.tmp".format(self.path, uuid.uuid4().hex)
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logger.warning("Could not save upload registry: {}".format(e))
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+    def __expire(self):
+        """
+        Drop the entries that cannot be reused anymore.
+
+        :return: Whether any entry was dropped.
+        :rtype: bool
+        """
+        deadline = time.time() + self.expiry_margin
+        expired = [key for key, entry in self.__entries.items() if entry.get("expires", 0) <= deadline]
+        for key in expired:
+            del self.__entries[key]
+        return bool(expired)
+
+    def get(self, sha256_hash):
+        """
+        :return: The remote file a content hash was uploaded as (``name``,
+            ``uri``, ``size`` and ``expires``), or None if it must be uploaded.
+        :rtype: dict or None
+        """
+        with self.__lock:
+            self.__load()
+            if self.__expire():
+                self.__save()
+            entry = self.__entries.get(sha256_hash)
+            return dict(entry) if entry is not None else None
+
+    def put(self, sha256_hash, name, size, uri=None, expires=None):
+        """
+        Register an upload.
+
+        :param expires: Expiration of the remote file (seconds since the epoch),
+            by default the usual lifetime of an uploaded file.
+        :type expires: float
+        """
+        now = time.time()
+        with self.__lock:
+            self.__load()
+            self.__expire()
+            self.__entries[sha256_hash] = {
+                "name": name,
+                "uri": uri,
+                "size": size,
+                "uploaded": now,
+                "expires": expires if expires is not None else now + DEFAULT_FILE_TTL_SECONDS
+            }
+            self.uploads += 1
+            self.__save()
+
+    def discard(self, sha256_hash):
+        """
+        Forget an upload that can no longer be used (deleted, or uploaded with
+        another API key).
+        """
+        with self.__lock:
+            self.__load()
+            if self.__entries.pop(sha256_hash, None) is not None:
+                self.__save()
+
+    def record_reuse(self, size):
+        """
+        Count an upload avoided by reusing a registered file of ``size`` bytes.
+        """
+        with self.__lock:
+            self.__load()
+            self.reused += 1
+            self.bytes_saved += size
+            self.__total_bytes_saved += size
+            self.__save()
+
+    def clear(self):
+        with self.__lock:
+            self.__entries = dict()
+            self.__save()
+
+    def stats(self):
+        with self.__lock:
+            self.__load()
+            return {
+                "uploads": self.uploads,
+                "reused": self.reused,
+                "bytes_saved": self.bytes_saved,
+                "total_bytes_saved": self.__total_bytes_saved,
+                "entries": len(self.__entries)
+            }
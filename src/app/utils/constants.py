@@ -1,9 +1,6 @@
 from PyQt5 import QtCore
 
 
-MAX_COMPONENTS_PER_TYPE = 1000
-
-
 MAP_SIZE_POLICY = {
 
 }
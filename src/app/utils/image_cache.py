@@ -0,0 +1,263 @@
+import os
+from collections import OrderedDict
+
+from PyQt5 import QtCore, QtGui, QtSvg
+
+
+DEFAULT_BUDGET_BYTES = 256 * 1024 * 1024
+MAX_SVG_DOCUMENTS = 64
+SVG_EXTENSIONS = (".svg", ".svgz")
+
+ASPECT_MODES = {
+    True: QtCore.Qt.KeepAspectRatio,
+    False: QtCore.Qt.IgnoreAspectRatio
+}
+
+
+def pixmap_bytes(pixmap):
+    return pixmap.width() * pixmap.height() * max(pixmap.depth(), 8) // 8
+
+
+def is_svg(path):
+    return os.path.splitext(path)[1].lower() in SVG_EXTENSIONS
+
+
+class PixmapCache(object):
+    """
+    Process-wide LRU cache of decoded images and their scaled renditions.
+
+    Originals are keyed by ``(path, mtime)`` and decoded once no matter how
+    many image components show them; renditions are keyed by
+    ``(path, mtime, width, height, scale, keep_aspect_ratio)``. Entries are
+    evicted least recently used first once ``budget`` bytes are exceeded.
+    Only smooth renditions are cached: fast ones are produced during
+    interactive resizes, where the target size changes on every frame.
+    """
+
+    def __init__(self, budget=DEFAULT_BUDGET_BYTES):
+        self.budget = budget
+        self.__entries = OrderedDict()   # key -> (pixmap, bytes)
+        self.__bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.__entries)
+
+    @property
+    def size_bytes(self):
+        return self.__bytes
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self.__entries),
+            "bytes": self.__bytes
+        }
+
+    @staticmethod
+    def mtime(path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def original(self, path):
+        """
+        Return the decoded image at ``path`` (a null pixmap if it cannot be read).
+
+        :rtype: QPixmap
+        """
+        mtime = self.mtime(path)
+        if mtime is None:
+            return QtGui.QPixmap()
+        key = (path, mtime)
+        pixmap = self.__get(key)
+        if pixmap is None:
+            pixmap = QtGui.QPixmap(path)
+            if not pixmap.isNull():
+                self.__put(key, pixmap)
+        return pixmap
+
+    def rendition_key(self, path, size, scale="fit", keep_aspect_ratio=True):
+        """
+        Cache key of the rendition of ``path`` at ``size``, or None if the
+        file does not exist or the size is empty.
+        """
+        mtime = self.mtime(path)
+        if mtime is None or size.isEmpty():
+            return None
+        return (path, mtime, size.width(), size.height(), scale, bool(keep_aspect_ratio))
+
+    def get(self, key):
+        return self.__get(key)
+
+    def put(self, key, pixmap):
+        if not pixmap.isNull():
+            self.__put(key, pixmap)
+
+    def scaled(self, path, size, scale="fit", keep_aspect_ratio=True, smooth=True):
+        """
+        Return the image at ``path`` scaled into ``size``.
+
+        :param size: Target size.
+        :type size: QSize
+        :param scale: "fit", "width" or "height".
+        :type scale: str
+        :param smooth: Use a smooth (cached) or a fast (uncached) transformation.
+        :type smooth: bool
+        :rtype: QPixmap
+        """
+        key = self.rendition_key(path, size, scale, keep_aspect_ratio)
+        if key is None:
+            return QtGui.QPixmap()
+
+        if smooth:
+            pixmap = self.__get(key)
+            if pixmap is not None:
+                return pixmap
+
+        original = self.original(path)
+        if original.isNull():
+            return original
+        pixmap = self.scale(original, size, scale, keep_aspect_ratio, smooth)
+        if smooth:
+            self.__put(key, pixmap)
+        return pixmap
+
+    @staticmethod
+    def target_size(source, size, scale="fit", keep_aspect_ratio=True):
+        """
+        Size of an image of size ``source`` once scaled into ``size``.
+
+        :rtype: QSize
+        """
+        if source.isEmpty():
+            return QtCore.QSize(size)
+        if scale == "width":
+            return QtCore.QSize(size.width(), max(1, round(source.height() * size.width() / source.width())))
+        elif scale == "height":
+            return QtCore.QSize(max(1, round(source.width() * size.height() / source.height())), size.height())
+        return source.scaled(size, ASPECT_MODES[bool(keep_aspect_ratio)])
+
+    @staticmethod
+    def scale(pixmap, size, scale="fit", keep_aspect_ratio=True, smooth=True):
+        transform = QtCore.Qt.SmoothTransformation if smooth else QtCore.Qt.FastTransformation
+        if scale == "width":
+            return pixmap.scaledToWidth(size.width(), transform)
+        elif scale == "height":
+            return pixmap.scaledToHeight(size.height(), transform)
+        return pixmap.scaled(size, ASPECT_MODES[bool(keep_aspect_ratio)], transform)
+
+    def clear(self):
+        self.__entries.clear()
+        self.__bytes = 0
+
+    def __get(self, key):
+        entry = self.__entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.__entries.move_to_end(key)
+        return entry[0]
+
+    def __put(self, key, pixmap):
+        size = pixmap_bytes(pixmap)
+        if size > self.budget:
+            return
+        previous = self.__entries.pop(key, None)
+        if previous is not None:
+            self.__bytes -= previous[1]
+        self.__entries[key] = (pixmap, size)
+        self.__bytes += size
+        while self.__bytes > self.budget:
+            _, (_, evicted_size) = self.__entries.popitem(last=False)
+            self.__bytes -= evicted_size
+
+
+class SvgRasterizer(object):
+    """
+    Rasterizes SVG files at the exact size they are displayed at.
+
+    Each document is parsed once into a QSvgRenderer (per ``(path, mtime)``,
+    least recently used documents are dropped beyond ``max_documents``) and
+    every rendition is painted as vectors into an image of the target size,
+    instead of bitmap-scaling a rasterization at the intrinsic size.
+    Renditions are stored in ``cache`` under the usual rendition key, so
+    components of the same size share one rasterization.
+    """
+
+    def __init__(self, cache, max_documents=MAX_SVG_DOCUMENTS):
+        self.__cache = cache
+        self.__max_documents = max_documents
+        self.__renderers = OrderedDict()    # (path, mtime) -> QSvgRenderer
+        self.parses = 0
+        self.renders = 0
+
+    def renderer(self, path):
+        """
+        Return the parsed document at ``path``, or None if it cannot be read.
+
+        :rtype: QSvgRenderer or None
+        """
+        mtime = PixmapCache.mtime(path)
+        if mtime is None:
+            return None
+        key = (path, mtime)
+        renderer = self.__renderers.get(key)
+        if renderer is not None:
+            self.__renderers.move_to_end(key)
+            return renderer
+
+        self.parses += 1
+        renderer = QtSvg.QSvgRenderer(path)
+        if not renderer.isValid():
+            return None
+        self.__renderers[key] = renderer
+        while len(self.__renderers) > self.__max_documents:
+            self.__renderers.popitem(last=False)
+        return renderer
+
+    def rendition(self, path, size, scale="fit", keep_aspect_ratio=True):
+        """
+        Return the SVG at ``path`` rasterized into ``size`` (a null pixmap on error).
+
+        :rtype: QPixmap
+        """
+        key = self.__cache.rendition_key(path, size, scale, keep_aspect_ratio)
+        if key is None:
+            return QtGui.QPixmap()
+        pixmap = self.__cache.get(key)
+        if pixmap is not None:
+            return pixmap
+
+        renderer = self.renderer(path)
+        if renderer is None:
+            return QtGui.QPixmap()
+        target = PixmapCache.target_size(renderer.defaultSize(), size, scale, keep_aspect_ratio)
+        image = QtGui.QImage(target, QtGui.QImage.Format_ARGB32_Premultiplied)
+        image.fill(QtCore.Qt.transparent)
+        painter = QtGui.QPainter(image)
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        renderer.render(painter, QtCore.QRectF(0, 0, target.width(), target.height()))
+        painter.end()
+        self.renders += 1
+
+        pixmap = QtGui.QPixmap.fromImage(image)
+        self.__cache.put(key, pixmap)
+        return pixmap
+
+    def stats(self):
+        return {
+            "documents": len(self.__renderers),
+            "parses": self.parses,
+            "renders": self.renders
+        }
+
+
+pixmap_cache = PixmapCache()
+svg_rasterizer = SvgRasterizer(pixmap_cache)
@@ -0,0 +1,124 @@
+import logging
+logger = logging.getLogger(__name__)
+
+from itertools import count
+
+from PyQt5 import QtCore, QtGui, sip
+
+from app.utils.image_cache import pixmap_cache, PixmapCache
+
+
+class _DecodeSignals(QtCore.QObject):
+    finished = QtCore.pyqtSignal(object, QtGui.QImage)
+
+
+class ImageDecodeTask(QtCore.QRunnable):
+    """
+    Decodes an image file directly at its display size with QImageReader.
+    Formats with scaled decoding support (JPEG) never build the full-resolution
+    image.
+    """
+
+    def __init__(self, key, path, size, scale, keep_aspect_ratio):
+        super(ImageDecodeTask, self).__init__()
+        self.setAutoDelete(False)
+        self.key = key
+        self.path = path
+        self.size = QtCore.QSize(size)
+        self.scale = scale
+        self.keep_aspect_ratio = keep_aspect_ratio
+        self.signals = _DecodeSignals()
+
+    def run(self):
+        try:
+            reader = QtGui.QImageReader(self.path)
+            source = reader.size()
+            if source.isValid():
+                reader.setScaledSize(PixmapCache.target_size(source, self.size, self.scale, self.keep_aspect_ratio))
+            image = reader.read()
+            if image.isNull():
+                logger.warning("Could not decode {}: {}".format(self.path, reader.errorString()))
+        except Exception:
+            logger.exception("Could not decode {}".format(self.path))
+            image = QtGui.QImage()
+        self.signals.finished.emit(self.key, image)
+
+
+class ImageLoader(QtCore.QObject):
+    """
+    Decodes images on a thread pool and stores the results in ``pixmap_cache``.
+
+    Each :meth:`request` returns a token. Requests for the same rendition share
+    a single decode, and a canceled token never receives its result, so
+    callers drop stale images simply by canceling the previous token when the
+    path or the size changes.
+    """
+
+    def __init__(self, pool=None, parent=None):
+        super(ImageLoader, self).__init__(parent)
+        self.__pool = pool if pool is not None else QtCore.QThreadPool.globalInstance()
+        self.__tokens = count(1)
+        self.__tasks = dict()       # rendition key -> ImageDecodeTask
+        self.__waiters = dict()     # rendition key -> {token: (owner, callback)}
+        self.__keys = dict()        # token -> rendition key
+
+    def request(self, key, path, size, scale, keep_aspect_ratio, owner, callback):
+        """
+        Decode ``path`` at ``size`` and call ``callback(token, pixmap)`` on the
+        GUI thread, unless ``owner`` has been deleted or the token was canceled.
+
+        :param key: Rendition key, see :meth:`PixmapCache.rendition_key`.
+        :type key: tuple
+        :rtype: int
+        """
+        token = next(self.__tokens)
+        self.__keys[token] = key
+        self.__waiters.setdefault(key, dict())[token] = (owner, callback)
+
+        if key not in self.__tasks:
+            task = ImageDecodeTask(key, path, size, scale, keep_aspect_ratio)
+            task.signals.finished.connect(self.__on_decoded)
+            self.__tasks[key] = task
+            self.__pool.start(task)
+        return token
+
+    def cancel(self, token):
+        key = self.__keys.pop(token, None)
+        if key is None:
+            return
+        waiters = self.__waiters.get(key)
+        if waiters is not None:
+            waiters.pop(token, None)
+            if not waiters:
+                del self.__waiters[key]
+                task = self.__tasks.get(key)
+                # Not started yet: nobody waits for it, so it never runs
+                if task is not None and self.__pool.tryTake(task):
+                    del self.__tasks[key]
+
+    @QtCore.pyqtSlot(object, QtGui.QImage)
+    def __on_decoded(self, key, image):
+        self.__tasks.pop(key, None)
+        waiters = self.__waiters.pop(key, dict())
+        pixmap = QtGui.QPixmap.fromImage(image) if not image.isNull() else QtGui.QPixmap()
+        pixmap_cache.put(key, pixmap)
+
+        for token, (owner, callback) in waiters.items():
+            self.__keys.pop(token, None)
+            if owner is not None and sip.isdeleted(owner):
+                continue
+            callback(token, pixmap)
+
+
+_image_loader = None
+
+
+def image_loader():
+    """
+    Return the process-wide image loader, created on first use (after the
+    QApplication exists).
+    """
+    global _image_loader
+    if _image_loader is None:
+        _image_loader = ImageLoader()
+    return _image_loader
@@ -0,0 +1,225 @@
+"""
+Incremental parsing of a JSON template while it is being received.
+"""
+import re
+import json
+
+
+NUMBER = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?")
+# Anything a number may start with, such as "-", "12." or "1.5e"
+NUMBER_PREFIX = re.compile(r"-?\d*(?:\.\d*)?(?:[eE][+-]?\d*)?")
+LITERALS = {"true": True, "false": False, "null": None}
+WHITESPACE = " \t\r\n"
+CHILDREN_KEY = "children"
+
+
+class _Frame(object):
+    """
+    An object or array still open.
+    """
+    __slots__ = ("value", "key", "expect_value", "node", "children_of")
+
+    def __init__(self, value, node=None, children_of=None):
+        self.value = value
+        self.key = None             # objects: key whose value comes next
+        self.expect_value = False   # objects: ":" seen, the next token is the value
+        self.node = node            # objects: _Node if this object is a template node
+        self.children_of = children_of  # arrays: _Node whose "children" this is
+
+
+class _Node(object):
+    __slots__ = ("id", "parent", "data", "emitted", "pending")
+
+    def __init__(self, id, parent, data):
+        self.id = id
+        self.parent = parent
+        self.data = data
+        self.emitted = False
+        self.pending = []           # descendants ready before this node was emitted
+
+
+class NodeStreamParser(object):
+    """
+    Parses a JSON template received in chunks and reports each node as soon
+    as its own fields are known, without waiting for the whole document.
+
+    A node is reported when its ``"children"`` array opens (every field before
+    it is complete), or when the node object closes. Nodes are always reported
+    parents first, in document order: a node whose fields are not known yet
+    holds back its descendants. Text before the first ``{`` (e.g. a markdown
+    fence) is ignored.
+
+    :meth:`feed` returns ``(node_id, parent_id, data)`` tuples, where ``data``
+    is the node without its children and ``parent_id`` is None for the root.
+    If a node receives a field after it was reported (the model wrote
+    ``"children"`` before another field), :attr:`complete` turns False and
+    the caller should rebuild from :meth:`result`.
+    """
+
+    def __init__(self):
+        self.__buffer = ""
+        self.__position = 0
+        self.__started = False
+        self.__stack = []
+        self.__root = None
+        self.__next_id = 0
+        self.__events = []
+        self.complete = True
+        self.nodes = 0
+
+    @property
+    def done(self):
+        """
+        Whether the root object has been closed.
+        """
+        return self.__root is not None and not self.__stack
+
+    def feed(self, text):
+        """
+        Parse the next chunk of the response.
+
+        :return: The nodes completed by this chunk.
+        :rtype: list(tuple)
+        """
+        self.__buffer += text
+        if not self.__started:
+            start = self.__buffer.find("{", self.__position)
+            if start == -1:
+                self.__position = len(self.__buffer)
+                return []
+            self.__position = start
+            self.__started = True
+
+        while not self.done:
+            token = self.__next_token()
+            if token is None:
+                break
+            self.__handle(*token)
+
+        # Parsed text is not needed anymore
+        self.__buffer = self.__buffer[self.__position:]
+        self.__position = 0
+
+        events, self.__events = self.__events, []
+        return events
+
+    def result(self):
+        """
+        The whole template once the root object is closed, None before.
+
+        :rtype: dict or None
+        """
+        return self.__root if self.done else None
+
+    def __next_token(self):
+        buffer = self.__buffer
+        position = self.__position
+        while position < len(buffer) and buffer[position] in WHITESPACE:
+            position += 1
+        self.__position = position
+        if position >= len(buffer):
+            return None
+
+        char = buffer[position]
+        if char in "{}[]:,":
+            self.__position = position + 1
+            return char, None
+
+        if char == '"':
+            end = position + 1
+            while True:
+                end = buffer.find('"', end)
+                if end == -1:
+                    return None
+                # A quote preceded by an odd number of backslashes is escaped
+                backslashes = 0
+                while buffer[end - 1 - backslashes] == "\\":
+                    backslashes += 1
+                if backslashes % 2 == 0:
+                    break
+                end += 1
+            self.__position = end + 1
+            return "value", json.loads(buffer[position:end + 1])
+
+        prefix = NUMBER_PREFIX.match(buffer, position)
+        if prefix.end() > position and prefix.end() == len(buffer):
+            return None     # the number may continue in the next chunk
+        match = NUMBER.match(buffer, position)
+        if match is not None:
+            self.__position = match.end()
+            text = match.group()
+            return "value", float(text) if any(c in text for c in ".eE") else int(text)
+
+        for literal, value in LITERALS.items():
+            if buffer.startswith(literal, position):
+                self.__position = position + len(literal)
+                return "value", value
+            if literal.startswith(buffer[position:]):
+                return None
+        raise ValueError("Unexpected {!r} at {}".format(char, position))
+
+    def __handle(self, kind, value):
+        top = self.__stack[-1] if self.__stack else None
+        if kind in ("{", "["):
+            container = dict() if kind == "{" else list()
+            frame = _Frame(container)
+            if top is None:
+                self.__root = container
+                frame.node = self.__new_node(None, container)
+            else:
+                if kind == "{" and top.children_of is not None:
+                    frame.node = self.__new_node(top.children_of, container)
+                elif kind == "[" and top.node is not None and top.key == CHILDREN_KEY:
+                    frame.children_of = top.node
+                    self.__ready(top.node)
+                self.__attach(top, container)
+            self.__stack.append(frame)
+        elif kind in ("}", "]"):
+            frame = self.__stack.pop()
+            if frame.node is not None:
+                self.__ready(frame.node)
+        elif kind == ":":
+            top.expect_value = True
+        elif kind == ",":
+            pass
+        elif isinstance(top.value, dict) and not top.expect_value:
+            top.key = value
+        else:
+            self.__attach(top, value)
+
+    def __attach(self, frame, value):
+        if isinstance(frame.value, list):
+            frame.value.append(value)
+            return
+        if frame.node is not None and frame.node.emitted and frame.key != CHILDREN_KEY:
+            self.complete = False
+        frame.value[frame.key] = value
+        frame.key = None
+        frame.expect_value = False
+
+    def __new_node(self, parent, data):
+        node = _Node(self.__next_id, parent, data)
+        self.__next_id += 1
+        self.nodes += 1
+        return node
+
+    def __ready(self, node):
+        """
+        The fields of ``node`` are known: report it, unless its parent has not
+        been reported yet.
+        """
+        if node.emitted:
+            return
+        parent = node.parent
+        if parent is not None and not parent.emitted:
+            parent.pending.append(node)
+            return
+        self.__emit(node)
+
+    def __emit(self, node):
+        node.emitted = True
+        data = {key: value for key, value in node.data.items() if key != CHILDREN_KEY}
+        self.__events.append((node.id, node.parent.id if node.parent is not None else None, data))
+        pending, node.pending = node.pending, []
+        for child in pending:
+            self.__emit(child)
@@ -0,0 +1,207 @@
+from PyQt5 import QtCore, QtWidgets
+
+
+class ComponentTreeModel(QtCore.QAbstractItemModel):
+    """
+    Item model of the component hierarchy, backed directly by a TemplateDocument.
+
+    The model observes the document and turns structural changes into row
+    insertions and removals. Between :meth:`begin_bulk` and :meth:`end_bulk`
+    appended nodes are not announced one by one: :meth:`flush` exposes them
+    with a single ``beginInsertRows`` batch per parent. The row count the
+    views see is therefore tracked separately from the document.
+    """
+    HEADERS = ("Name", "Type")
+
+    def __init__(self, document, parent=None):
+        super(ComponentTreeModel, self).__init__(parent)
+        self.__document = document
+        self.__row_counts = dict()     # node -> rows exposed to the views
+        self.__pending = dict()        # parents with unannounced rows (ordered set)
+        self.__bulk = 0
+        self.__persistent = dict()     # node -> QPersistentModelIndex
+
+        for node in document.root.walk():
+            self.__row_counts[node] = len(node.children)
+        document.observers.append(self)
+
+    # *** QAbstractItemModel ***
+    def index(self, row, column, parent=QtCore.QModelIndex()):
+        if not self.hasIndex(row, column, parent):
+            return QtCore.QModelIndex()
+        if not parent.isValid():
+            return self.createIndex(row, column, self.__document.root)
+        return self.createIndex(row, column, parent.internalPointer().children[row])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QtCore.QModelIndex()
+        parent = index.internalPointer().parent
+        if parent is None:
+            return QtCore.QModelIndex()
+        return self.createIndex(parent.row(), 0, parent)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if not parent.isValid():
+            return 1
+        if parent.column() > 0:
+            return 0
+        return self.__row_counts.get(parent.internalPointer(), 0)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return len(self.HEADERS)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid() or role != QtCore.Qt.DisplayRole:
+            return None
+        node = index.internalPointer()
+        return node.name if index.column() == 0 else node.type
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if orientation == QtCore.Qt.Horizontal and role == QtCore.Qt.DisplayRole:
+            return self.HEADERS[section]
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return QtCore.Qt.NoItemFlags
+        return QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable
+
+    # *** PUBLIC ***
+    def index_for_node(self, node, column=0):
+        """
+        Return the model index of ``node``. Indexes are kept in a persistent
+        map, so repeated lookups are O(1).
+
+        :rtype: QModelIndex
+        """
+        persistent = self.__persistent.get(node)
+        if persistent is None or not persistent.isValid():
+            if node.document is not self.__document or not self.__is_exposed(node):
+                return QtCore.QModelIndex()
+            index = self.createIndex(node.row(), 0, node)
+            persistent = self.__persistent[node] = QtCore.QPersistentModelIndex(index)
+
+        index = QtCore.QModelIndex(persistent)
+        return index if column == 0 else index.sibling(index.row(), column)
+
+    def begin_bulk(self):
+        self.__bulk += 1
+
+    def end_bulk(self):
+        self.__bulk = max(0, self.__bulk - 1)
+        if self.__bulk == 0:
+            self.flush()
+
+    def flush(self):
+        """
+        Announce the rows appended since the last flush, one
+        ``beginInsertRows`` batch per parent, parents first.
+        """
+        queue = sorted(self.__pending, key=lambda node: node.depth)
+        self.__pending.clear()
+        while queue:
+            parent = queue.pop(0)
+            if parent.document is not self.__document or not self.__is_exposed(parent):
+                continue
+            first = self.__row_counts.get(parent, 0)
+            last = len(parent.children) - 1
+            if last < first:
+                continue
+            self.beginInsertRows(self.index_for_node(parent), first, last)
+            self.__row_counts[parent] = last + 1
+            new_children = parent.children[first:]
+            for child in new_children:
+                self.__row_counts[child] = 0
+            self.endInsertRows()
+            # Subtrees attached as a whole still have to expose their own rows
+            queue.extend(child for child in new_children if child.children)
+
+    # *** DOCUMENT OBSERVER ***
+    def node_about_to_be_inserted(self, parent, row, node):
+        if self.__bulk:
+            return
+        if self.__pending:
+            self.flush()
+        self.beginInsertRows(self.index_for_node(parent), row, row)
+
+    def node_inserted(self, parent, row, node):
+        if self.__bulk:
+            self.__pending[parent] = None
+            return
+        self.__row_counts[parent] = len(parent.children)
+        for descendant in node.walk():
+            self.__row_counts[descendant] = len(descendant.children)
+        self.endInsertRows()
+
+    def node_about_to_be_removed(self, parent, row, node):
+        if self.__pending:
+            self.flush()
+        self.beginRemoveRows(self.index_for_node(parent), row, row)
+
+    def node_removed(self, parent, row, node):
+        for descendant in node.walk():
+            self.__row_counts.pop(descendant, None)
+            self.__persistent.pop(descendant, None)
+        self.__row_counts[parent] = len(parent.children)
+        self.endRemoveRows()
+
+    # *** PRIVATE ***
+    def __is_exposed(self, node):
+        while node.parent is not None:
+            if node.row() >= self.__row_counts.get(node.parent, 0):
+                return False
+            node = node.parent
+        return True
+
+
+class CustomTreeView(QtWidgets.QTreeView):
+    """
+    Object inspector view. Rows have uniform heights so only the visible
+    part of large trees is laid out and painted.
+
+    Señales:
+        item_deleted(TemplateNode): the user asked to delete a component
+        current_node_changed(TemplateNode): the current row changed (None if cleared)
+    """
+    item_deleted = QtCore.pyqtSignal(object)
+    current_node_changed = QtCore.pyqtSignal(object)
+    def __init__(self, parent=None):
+        super(CustomTreeView, self).__init__(parent)
+        self.setUniformRowHeights(True)
+        self.setSelectionMode(QtWidgets.QAbstractItemView.SingleSelection)
+        self.setContextMenuPolicy(QtCore.Qt.CustomContextMenu)
+        self.customContextMenuRequested.connect(self.on_context_menu_requested)
+
+    def current_node(self):
+        index = self.currentIndex()
+        return index.internalPointer() if index.isValid() else None
+
+    def set_current_node(self, node):
+        index = self.model().index_for_node(node) if node is not None else QtCore.QModelIndex()
+        self.setCurrentIndex(index)
+        if index.isValid():
+            self.scrollTo(index)
+
+    def delete_component(self, node):
+        # The canvas is the root of the document and cannot be deleted
+        if node is not None and node.parent is not None:
+            self.item_deleted.emit(node)
+
+    def on_context_menu_requested(self, pos):
+        index = self.indexAt(pos)
+        if index.isValid():
+            menu = QtWidgets.QMenu()
+            delete_action = menu.addAction("Delete")
+            action = menu.exec_(self.mapToGlobal(pos))
+            if action == delete_action:
+                self.delete_component(index.internalPointer())
+
+    def keyPressEvent(self, event):
+        super().keyPressEvent(event)
+        if event.key() == QtCore.Qt.Key.Key_Delete:
+            self.delete_component(self.current_node())
+
+    def currentChanged(self, current, previous):
+        super().currentChanged(current, previous)
+        self.current_node_changed.emit(current.internalPointer() if current.isValid() else None)
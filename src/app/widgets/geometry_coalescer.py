@@ -0,0 +1,74 @@
+from PyQt5 import QtCore, sip
+
+
+FRAME_INTERVAL_MS = 16
+
+
+class GeometrySignalCoalescer(QtCore.QObject):
+    """
+    Collapses the ``geometry_changed`` signals of the watched widgets into at
+    most one notification per widget and frame.
+
+    A drag or a layout cascade makes a widget emit several move/resize events
+    before the next repaint; only the last geometry of each widget is kept and
+    re-emitted when the frame timer fires (or on :meth:`flush`).
+
+    Señales:
+        geometry_changed(QWidget, tuple, tuple): widget, position and size
+    """
+    geometry_changed = QtCore.pyqtSignal(object, tuple, tuple)
+
+    def __init__(self, interval=FRAME_INTERVAL_MS, parent=None):
+        super(GeometrySignalCoalescer, self).__init__(parent)
+        self.__pending = dict()     # widget -> (pos, size), in arrival order
+        self.raw_events = 0
+        self.emitted_events = 0
+
+        self.__timer = QtCore.QTimer(self)
+        self.__timer.setSingleShot(True)
+        self.__timer.setInterval(interval)
+        self.__timer.timeout.connect(self.flush)
+
+    @property
+    def absorbed_events(self):
+        """
+        Raw geometry events that did not reach the listeners.
+        """
+        return self.raw_events - self.emitted_events - len(self.__pending)
+
+    def reset_stats(self):
+        self.raw_events = 0
+        self.emitted_events = 0
+
+    def watch(self, widget):
+        widget.geometry_changed.connect(self.__on_geometry_changed)
+
+    def unwatch(self, widget):
+        try:
+            widget.geometry_changed.disconnect(self.__on_geometry_changed)
+        except TypeError:
+            pass
+        self.__pending.pop(widget, None)
+
+    def flush(self):
+        """
+        Emit the pending geometry of every widget now.
+        """
+        self.__timer.stop()
+        while self.__pending:
+            pending, self.__pending = self.__pending, dict()
+            for widget, (pos, size) in pending.items():
+                if sip.isdeleted(widget):
+                    continue
+                self.emitted_events += 1
+                self.geometry_changed.emit(widget, pos, size)
+
+    @QtCore.pyqtSlot(tuple, tuple)
+    def __on_geometry_changed(self, pos, size):
+        widget = self.sender()
+        self.raw_events += 1
+        # Re-inserted so widgets are emitted in the order of their last change
+        self.__pending.pop(widget, None)
+        self.__pending[widget] = (pos, size)
+        if not self.__timer.isActive():
+            self.__timer.start()
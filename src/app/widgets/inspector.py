@@ -0,0 +1,424 @@
+import re
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+from app.utils.constants import MAP_SHAPES, IMAP_SHAPES
+
+
+MARGINS_PATTERN = r"^\d+,\d+,\d+,\d+$"
+
+
+class PropertyInspector(QtWidgets.QTreeWidget):
+    """
+    Property editor of the selected component.
+
+    Every group of editors is built once. Selecting a component only shows the
+    groups of its type and loads its values into the editors with signals
+    blocked, so no widgets are created or connected per selection. Edits are
+    routed through a binding table (editor -> group, key, value getter) and
+    reported with :attr:`property_changed`.
+
+    Señales:
+        property_changed(str, str, object): group, key and new value
+    """
+    property_changed = QtCore.pyqtSignal(str, str, object)
+
+    GROUPS_BY_TYPE = {
+        "canvas": ("geometry", "constraints", "grid"),
+        "container": ("geometry", "size_policy", "constraints", "styles"),
+        "text": ("geometry", "size_policy", "text", "styles"),
+        "image": ("geometry", "size_policy", "image")
+    }
+
+    def __init__(self, parent=None):
+        super(PropertyInspector, self).__init__(parent)
+        self.setColumnCount(2)
+        self.setHeaderLabels(["Property", "Value"])
+        self.header().setSectionResizeMode(QtWidgets.QHeaderView.ResizeToContents)
+
+        self.__widget = None
+        self.__groups = dict()       # group -> top level item
+        self.__editors = dict()      # (group, key) -> editor
+        self.__bindings = dict()     # editor -> (group, key, getter)
+
+        self.__build_geometry()
+        self.__build_size_policy()
+        self.__build_constraints()
+        self.__build_text()
+        self.__build_image()
+        self.__build_styles()
+        self.__build_grid()
+
+        self.__binders = {
+            "geometry": self.__bind_geometry,
+            "size_policy": self.__bind_size_policy,
+            "constraints": self.__bind_constraints,
+            "text": self.__bind_text,
+            "image": self.__bind_image,
+            "styles": self.__bind_styles,
+            "grid": self.__bind_grid
+        }
+        self.bind(None)
+
+    # *** PUBLIC ***
+    @property
+    def widget(self):
+        """
+        Component currently shown by the inspector, or None.
+        """
+        return self.__widget
+
+    def bind(self, widget):
+        """
+        Show the properties of ``widget``.
+
+        :param widget: The selected component, or None to hide every group.
+        :type widget: QWidget or None
+        """
+        self.__widget = widget
+        kind = widget.property("component_type").lower() if widget is not None else None
+        visible = self.GROUPS_BY_TYPE.get(kind, ())
+        for group, item in self.__groups.items():
+            item.setHidden(group not in visible)
+        if widget is None:
+            return
+
+        self.__block_signals(True)
+        try:
+            for group in visible:
+                self.__binders[group](widget)
+        finally:
+            self.__block_signals(False)
+
+    def set_geometry(self, pos, size):
+        """
+        Refresh the geometry editors without emitting :attr:`property_changed`.
+
+        :param pos: Position as a tuple (x, y).
+        :type pos: tuple
+        :param size: Size as a tuple (width, height).
+        :type size: tuple
+        """
+        self.__groups["geometry"].setText(1, "({0}, {1}), {2} x {3}".format(*pos, *size))
+        for key, value in zip(("x", "y", "width", "height"), (*pos, *size)):
+            spinbox = self.__editors["geometry", key]
+            spinbox.blockSignals(True)
+            spinbox.setValue(value)
+            spinbox.blockSignals(False)
+
+        # The radius is bounded by the shortest side of the component
+        if not self.__groups["styles"].isHidden():
+            self.__editors["styles", "radius"].setRange(0, min(size[0] // 2, size[1] // 2))
+
+    def constraint_values(self):
+        """
+        Return the layout configured in the constraints editors.
+
+        :rtype: dict
+        """
+        return {
+            "layout": self.__editors["constraints", "layout"].currentText().lower(),
+            "margins": list(map(int, self.__editors["constraints", "margins"].text().split(","))),
+            "spacing": self.__editors["constraints", "spacing"].value()
+        }
+
+    # *** BUILD ***
+    def __add_group(self, group, title):
+        item = QtWidgets.QTreeWidgetItem([title, ""])
+        self.addTopLevelItem(item)
+        self.__groups[group] = item
+        return item
+
+    def __add_editor(self, group, key, title, editor, signal=None, getter=None):
+        """
+        Add a row with ``editor`` to ``group``. When ``signal`` is given, the
+        editor is registered in the binding table and ``getter(editor)``
+        provides the value to report (None to ignore the change).
+        """
+        if title is None:
+            item = self.__groups[group]
+        else:
+            item = QtWidgets.QTreeWidgetItem([title, ""])
+            self.__groups[group].addChild(item)
+        self.setItemWidget(item, 1, editor)
+        self.__editors[group, key] = editor
+        if signal is not None:
+            self.__bind_editor(editor, signal, group, key, getter)
+        return editor
+
+    def __bind_editor(self, editor, signal, group, key, getter):
+        self.__bindings[editor] = (group, key, getter)
+        signal.connect(self.__on_editor_changed)
+
+    @staticmethod
+    def __new_combobox(items):
+        combobox = QtWidgets.QComboBox()
+        combobox.addItems(items)
+        return combobox
+
+    @staticmethod
+    def __new_spinbox(minimum, maximum):
+        spinbox = QtWidgets.QSpinBox()
+        spinbox.setRange(minimum, maximum)
+        return spinbox
+
+    def __build_geometry(self):
+        self.__add_group("geometry", "Geometry")
+        for key, title in (("x", "X"), ("y", "Y"), ("width", "Width"), ("height", "Height")):
+            spinbox = self.__new_spinbox(0, 99999)
+            self.__add_editor("geometry", key, title, spinbox, spinbox.valueChanged, QtWidgets.QSpinBox.value)
+
+    def __build_size_policy(self):
+        self.__add_group("size_policy", "Size Policy")
+        for key, title in (("horizontal", "Horizontal"), ("vertical", "Vertical")):
+            combobox = self.__new_combobox(["Fixed", "Preferred"])
+            self.__add_editor("size_policy", key, title, combobox, combobox.currentIndexChanged, self.__size_policy_value)
+
+    def __build_constraints(self):
+        self.__add_group("constraints", "Constraints")
+
+        chk_constraints = QtWidgets.QCheckBox()
+        self.__add_editor("constraints", "enabled", None, chk_constraints, chk_constraints.toggled, self.__constraints_enabled_value)
+
+        cmb_layout_type = self.__new_combobox(["Horizontal", "Vertical"])
+        self.__add_editor("constraints", "layout", "Layout", cmb_layout_type, cmb_layout_type.currentTextChanged, self.__lower_text)
+
+        line_edit_margins = QtWidgets.QLineEdit()
+        self.__add_editor("constraints", "margins", "Margins", line_edit_margins, line_edit_margins.editingFinished, self.__margins_value)
+
+        spinbox_spacing = self.__new_spinbox(0, 99)
+        self.__add_editor("constraints", "spacing", "Spacing", spinbox_spacing, spinbox_spacing.valueChanged, QtWidgets.QSpinBox.value)
+
+    def __build_text(self):
+        self.__add_group("text", "Text")
+
+        line_edit_text = QtWidgets.QLineEdit()
+        self.__add_editor("text", "text", "Text", line_edit_text, line_edit_text.textChanged, QtWidgets.QLineEdit.text)
+        # TODO: CONSIDER THE FONT WEIGHT
+        self.__add_editor("text", "font", "Font family", QtWidgets.QPushButton())
+
+        spin_font_size = self.__new_spinbox(1, 9999)
+        self.__add_editor("text", "font_size", "Font size", spin_font_size, spin_font_size.valueChanged, QtWidgets.QSpinBox.value)
+
+        btn_font_color = QtWidgets.QPushButton()
+        self.__add_editor("text", "font_color", "Font color", btn_font_color, btn_font_color.clicked, self.__rgb_color_value)
+
+        for key, title, items in (
+            ("ha", "Horizontal alignment", ["Left", "Center", "Right"]),
+            ("va", "Vertical alignment", ["Top", "Center", "Bottom"])
+        ):
+            combobox = self.__new_combobox(items)
+            self.__add_editor("text", key, title, combobox, combobox.currentTextChanged, self.__lower_text)
+
+    def __build_image(self):
+        self.__add_group("image", "Image")
+
+        browser_image = QtWidgets.QWidget()
+        line_edit_image = QtWidgets.QLineEdit("")
+        line_edit_image.setReadOnly(True)
+        btn_add_image = QtWidgets.QPushButton("+")
+        btn_add_image.setFixedSize(22, 22)
+        btn_remove_image = QtWidgets.QPushButton("-")
+        btn_remove_image.setFixedSize(22, 22)
+
+        h_layout_browser_image = QtWidgets.QHBoxLayout()
+        h_layout_browser_image.setContentsMargins(0, 0, 0, 0)
+        h_layout_browser_image.addWidget(line_edit_image)
+        h_layout_browser_image.addWidget(btn_add_image)
+        h_layout_browser_image.addWidget(btn_remove_image)
+        browser_image.setLayout(h_layout_browser_image)
+
+        self.__add_editor("image", "path", "Path", browser_image)
+        self.__editors["image", "path"] = line_edit_image
+        self.__bind_editor(btn_add_image, btn_add_image.clicked, "image", "path", self.__browse_image_value)
+        self.__bind_editor(btn_remove_image, btn_remove_image.clicked, "image", "path", self.__clear_image_value)
+
+        chk_image_keep_aspect = QtWidgets.QCheckBox()
+        self.__add_editor("image", "keep_aspect_ratio", "Keep aspect ratio", chk_image_keep_aspect, chk_image_keep_aspect.toggled, QtWidgets.QCheckBox.isChecked)
+
+        cmb_scale_type = self.__new_combobox(["Fit", "Width", "Height"])
+        self.__add_editor("image", "scale", "Scale type", cmb_scale_type, cmb_scale_type.currentTextChanged, self.__lower_text)
+
+        for key, title, items in (
+            ("ha", "Horizontal alignment", ["Left", "Center", "Right"]),
+            ("va", "Vertical alignment", ["Top", "Center", "Bottom"])
+        ):
+            combobox = self.__new_combobox(items)
+            self.__add_editor("image", key, title, combobox, combobox.currentTextChanged, self.__lower_text)
+
+    def __build_styles(self):
+        self.__add_group("styles", "Styles")
+
+        cmb_shape = self.__new_combobox(["Rectangle", "Rounded Rectangle", "Circular"])
+        self.__add_editor("styles", "shape", "Shape", cmb_shape, cmb_shape.currentIndexChanged, self.__shape_value)
+
+        spin_line_width = self.__new_spinbox(1, 99)
+        self.__add_editor("styles", "line_width", "Line Width", spin_line_width, spin_line_width.valueChanged, QtWidgets.QSpinBox.value)
+
+        for key, title in (("fill_color", "Fill Color"), ("edge_color", "Edge Color")):
+            btn_color = QtWidgets.QPushButton()
+            self.__add_editor("styles", key, title, btn_color, btn_color.clicked, self.__rgba_color_value)
+
+        spin_radius = self.__new_spinbox(0, 99999)
+        self.__add_editor("styles", "radius", "Radius", spin_radius, spin_radius.valueChanged, QtWidgets.QSpinBox.value)
+
+    def __build_grid(self):
+        self.__add_group("grid", "Grid")
+
+        chk_grid_visible = QtWidgets.QCheckBox()
+        self.__add_editor("grid", "visible", "Visible", chk_grid_visible, chk_grid_visible.toggled, QtWidgets.QCheckBox.isChecked)
+
+        spin_grid_spacing = self.__new_spinbox(2, 999)
+        self.__add_editor("grid", "spacing", "Spacing", spin_grid_spacing, spin_grid_spacing.valueChanged, QtWidgets.QSpinBox.value)
+
+    # *** BIND ***
+    def __block_signals(self, block):
+        for editor in self.__bindings:
+            editor.blockSignals(block)
+
+    def __bind_geometry(self, widget):
+        is_canvas = widget.property("component_type").lower() == "canvas"
+        pos = (0, 0) if is_canvas else (widget.pos().x(), widget.pos().y())
+        size = (widget.width(), widget.height())
+        self.__groups["geometry"].setText(1, "({0}, {1}), {2} x {3}".format(*pos, *size))
+        for key, value in zip(("x", "y", "width", "height"), (*pos, *size)):
+            self.__editors["geometry", key].setValue(value)
+        for key in ("x", "y"):
+            self.__editors["geometry", key].setEnabled(not is_canvas)
+
+    def __bind_size_policy(self, widget):
+        size_policy_h = "Fixed" if widget.sizePolicy().horizontalPolicy() == QtWidgets.QSizePolicy.Fixed else "Preferred"
+        size_policy_v = "Fixed" if widget.sizePolicy().verticalPolicy() == QtWidgets.QSizePolicy.Fixed else "Preferred"
+        self.__editors["size_policy", "horizontal"].setCurrentText(size_policy_h)
+        self.__editors["size_policy", "vertical"].setCurrentText(size_policy_v)
+        self.__groups["size_policy"].setText(1, "({}, {})".format(size_policy_h, size_policy_v))
+
+    def __bind_constraints(self, widget):
+        layout = widget.layout()
+        if layout is None:
+            margins = "0,0,0,0"
+            spacing = 0
+        else:
+            qmargins = layout.contentsMargins()
+            margins = ",".join(map(str, (qmargins.left(), qmargins.top(), qmargins.right(), qmargins.bottom())))
+            spacing = layout.spacing()
+
+        self.__editors["constraints", "enabled"].setChecked(layout is not None)
+        self.__editors["constraints", "layout"].setCurrentText(
+            "Vertical" if isinstance(layout, QtWidgets.QVBoxLayout) else "Horizontal"
+        )
+        self.__editors["constraints", "margins"].setText(margins)
+        self.__editors["constraints", "margins"].setProperty("previous_value", margins)
+        self.__editors["constraints", "spacing"].setValue(spacing)
+        self.__set_constraint_editors_enabled(layout is not None)
+
+    def __bind_text(self, widget):
+        label_format = widget.text_properties
+        self.__editors["text", "text"].setText(label_format["text"])
+        self.__editors["text", "font"].setText(label_format["font"])
+        self.__editors["text", "font_size"].setValue(label_format["font_size"])
+        self.__editors["text", "font_color"].setText("({}, {}, {})".format(*label_format["font_color"][:3]))
+        self.__editors["text", "ha"].setCurrentText(label_format["ha"].capitalize())
+        self.__editors["text", "va"].setCurrentText(label_format["va"].capitalize())
+
+    def __bind_image(self, widget):
+        image_properties = widget.image_properties
+        self.__editors["image", "path"].setText(image_properties["path"])
+        self.__editors["image", "keep_aspect_ratio"].setChecked(image_properties["keep_aspect_ratio"])
+        self.__editors["image", "scale"].setCurrentText(image_properties["scale"].title())
+        self.__editors["image", "ha"].setCurrentText(image_properties["ha"].capitalize())
+        self.__editors["image", "va"].setCurrentText(image_properties["va"].capitalize())
+
+    def __bind_styles(self, widget):
+        wdg_styles = widget.style
+        self.__editors["styles", "shape"].setCurrentText(IMAP_SHAPES[wdg_styles["shape"]])
+        self.__editors["styles", "line_width"].setValue(wdg_styles["line_width"])
+        self.__editors["styles", "fill_color"].setText("({}, {}, {}, {})".format(*wdg_styles["fill_color"]))
+        self.__editors["styles", "edge_color"].setText("({}, {}, {}, {})".format(*wdg_styles["edge_color"]))
+        spin_radius = self.__editors["styles", "radius"]
+        spin_radius.setRange(0, 99999)
+        spin_radius.setValue(wdg_styles["radius"])
+        spin_radius.setEnabled(wdg_styles["shape"] == "rounded_rect")
+
+    def __bind_grid(self, widget):
+        self.__editors["grid", "visible"].setChecked(widget.grid_visible)
+        self.__editors["grid", "spacing"].setValue(widget.grid_spacing)
+
+    def __set_constraint_editors_enabled(self, enabled):
+        for key in ("layout", "margins", "spacing"):
+            self.__editors["constraints", key].setEnabled(enabled)
+
+    # *** VALUE GETTERS ***
+    @staticmethod
+    def __lower_text(combobox):
+        return combobox.currentText().lower()
+
+    def __size_policy_value(self, combobox):
+        self.__groups["size_policy"].setText(1, "({}, {})".format(
+            self.__editors["size_policy", "horizontal"].currentText(),
+            self.__editors["size_policy", "vertical"].currentText()
+        ))
+        return combobox.currentText().lower()
+
+    def __constraints_enabled_value(self, checkbox):
+        self.__set_constraint_editors_enabled(checkbox.isChecked())
+        return checkbox.isChecked()
+
+    @staticmethod
+    def __margins_value(line_edit):
+        current_text = line_edit.text()
+        if re.match(MARGINS_PATTERN, current_text):
+            line_edit.setProperty("previous_value", current_text)
+            return list(map(int, current_text.split(",")))
+
+        # Revert to previous valid text
+        line_edit.blockSignals(True)
+        line_edit.setText(line_edit.property("previous_value"))
+        line_edit.blockSignals(False)
+        return None
+
+    def __pick_color(self, button, alpha):
+        color_list = list(map(int, button.text().replace(" ", "")[1:-1].split(",")))
+        options = QtWidgets.QColorDialog.ShowAlphaChannel if alpha else QtWidgets.QColorDialog.ColorDialogOptions()
+        new_color = QtWidgets.QColorDialog.getColor(QtGui.QColor(*color_list), self, "Color picker", options)
+        if not new_color.isValid():
+            return None
+        color = new_color.getRgb() if alpha else new_color.getRgb()[:3]
+        button.setText("({})".format(", ".join(map(str, color))))
+        return color
+
+    def __rgb_color_value(self, button):
+        return self.__pick_color(button, alpha=False)
+
+    def __rgba_color_value(self, button):
+        return self.__pick_color(button, alpha=True)
+
+    def __browse_image_value(self, _):
+        filename, _ = QtWidgets.QFileDialog.getOpenFileName(self, "Abrir imagen", "", "Images (*.png *.jpg *.jpeg *.bmp *.svg)")
+        if filename == "":
+            return None
+        self.__editors["image", "path"].setText(filename)
+        return filename
+
+    def __clear_image_value(self, _):
+        self.__editors["image", "path"].setText("")
+        return ""
+
+    def __shape_value(self, combobox):
+        new_shape = MAP_SHAPES[combobox.currentText()]
+        spin_radius = self.__editors["styles", "radius"]
+        spin_radius.blockSignals(True)
+        spin_radius.setValue(0)
+        spin_radius.blockSignals(False)
+        spin_radius.setEnabled(new_shape == "rounded_rect")
+        return new_shape
+
+    # *** SLOTS ***
+    def __on_editor_changed(self, *_):
+        if self.__widget is None:
+            return
+        editor = self.sender()
+        group, key, getter = self.__bindings[editor]
+        value = getter(editor)
+        if value is not None:
+            self.property_changed.emit(group, key, value)
@@ -1,10 +1,21 @@
 from PyQt5 import QtCore, QtGui, QtWidgets, sip
 from app.utils.constants import MAP_LABEL_ALIGNMENT
+from app.utils.colors import ColorArray
+from app.utils.image_cache import pixmap_cache, svg_rasterizer, PixmapCache, is_svg
+from app.utils.image_loader import image_loader
+from app.models.template import TemplateNode, Constraints
 
 
 FALSE_STATE_COLOR = (233, 233, 233)
 TRUE_STATE_COLOR = (68, 68, 68)
 
+GRID_SPACING = 24
+GRID_COLOR = QtGui.QColor(200, 200, 200)
+CANVAS_BACKGROUND_COLOR = QtGui.QColor(255, 255, 255)
+
+IMAGE_SETTLE_MS = 150
+IMAGE_PLACEHOLDER_TEXT = "Loading image..."
+
 
 class ECWSwitch(QtWidgets.QWidget):
     """
@@ -163,20 +174,56 @@ class ECWSwitch(QtWidgets.QWidget):
 
 
 class CustomLabel(QtWidgets.QLabel):
+    """
+    Word-wrapped label that paints its text with an explicit font and color
+    instead of a per-label style sheet.
+
+    ``paint_count`` counts the paint events of every instance, which makes
+    repaint storms measurable on large templates.
+    """
+    paint_count = 0
+    __text_styles = dict()   # (family, pixel size, rgb) -> (QFont, QColor), shared by every label
+
     def __init__(self, *args, **kwargs):
         super(CustomLabel, self).__init__(*args, **kwargs)
         self.text_alignment = QtCore.Qt.AlignCenter | QtCore.Qt.AlignVCenter
+        self.text_color = QtGui.QColor(0, 0, 0)
         self.setWordWrap(True)
         self.setFont(QtGui.QFont("Times New Roman"))
-        self.setStyleSheet("background-color: transparent;")
+        self.setStyleSheet("border: none; background-color: transparent;")
+
+    @classmethod
+    def text_style(cls, family, pixel_size, color):
+        """
+        Return the shared font and color for a text style, creating them once.
+
+        :rtype: tuple(QFont, QColor)
+        """
+        key = (family, pixel_size, tuple(int(c) for c in color[:3]))
+        style = cls.__text_styles.get(key)
+        if style is None:
+            font = QtGui.QFont(family)
+            font.setPixelSize(max(1, int(pixel_size)))
+            style = cls.__text_styles[key] = (font, QtGui.QColor(*key[2]))
+        return style
+
+    def set_text_style(self, family, pixel_size, color):
+        font, text_color = self.text_style(family, pixel_size, color)
+        if font != self.font() or text_color != self.text_color:
+            self.text_color = text_color
+            self.setFont(font)
+            self.update()
 
     def paintEvent(self, _):
+        CustomLabel.paint_count += 1
         opt = QtWidgets.QStyleOption()
         opt.initFrom(self)
         painter = QtGui.QPainter(self)
 
         self.style().drawPrimitive(QtWidgets.QStyle.PE_Widget, opt, painter, self)
 
+        painter.setFont(self.font())
+        painter.setPen(self.text_color)
         self.style().drawItemText(
             painter, self.rect(),
             # self.text_alignment | QtCore.Qt.TextWrapAnywhere,
@@ -188,8 +235,80 @@ class CustomLabel(QtWidgets.QLabel):
         
 
 class CustomWidget(QtWidgets.QFrame):
+    """
+    Base frame of every template component. The widget is a view over
+    ``self.node``: geometry, size policy, constraints and parenting changes
+    are written through to the node so the document never needs to be
+    rebuilt from the widget tree.
+    """
     def __init__(self, *args, **kwargs):
         super(CustomWidget, self).__init__(*args, **kwargs)
+        self.node = TemplateNode()
+        self.node.component.size = [self.width(), self.height()]
+        self._sync_size_policy()
+
+    def childEvent(self, event):
+        super().childEvent(event)
+        node = getattr(event.child(), "node", None)
+        if not isinstance(node, TemplateNode):
+            return
+        if event.added():
+            self.node.append(node)
+        elif event.removed() and node.parent is self.node:
+            node.detach()
+
+    def setSizePolicy(self, *args):
+        super().setSizePolicy(*args)
+        self._sync_size_policy()
+
+    # Qt delivers move and resize events to hidden widgets only once they are
+    # shown, so geometry set from code is also written to the node right away
+    def move(self, *args):
+        super().move(*args)
+        self._sync_geometry()
+
+    def resize(self, *args):
+        super().resize(*args)
+        self._sync_geometry()
+
+    def setGeometry(self, *args):
+        super().setGeometry(*args)
+        self._sync_geometry()
+
+    def setFixedSize(self, *args):
+        super().setFixedSize(*args)
+        self._sync_geometry()
+
+    def setFixedWidth(self, w):
+        super().setFixedWidth(w)
+        self._sync_geometry()
+
+    def setFixedHeight(self, h):
+        super().setFixedHeight(h)
+        self._sync_geometry()
+
+    def _sync_geometry(self):
+        self.node.component.pos = [self.x(), self.y()]
+        self.node.component.size = [self.width(), self.height()]
+
+    def _sync_size_policy(self):
+        size_policy = self.sizePolicy()
+        self.node.component.size_policy = [
+            "fixed" if size_policy.horizontalPolicy() == QtWidgets.QSizePolicy.Fixed else "preferred",
+            "fixed" if size_policy.verticalPolicy() == QtWidgets.QSizePolicy.Fixed else "preferred"
+        ]
+
+    def _sync_constraints(self):
+        layout = self.layout()
+        if layout is None:
+            self.node.constraints = None
+            return
+        margins = layout.contentsMargins()
+        self.node.constraints = Constraints(
+            layout="vertical" if isinstance(layout, QtWidgets.QVBoxLayout) else "horizontal",
+            margins=[margins.left(), margins.top(), margins.right(), margins.bottom()],
+            spacing=layout.spacing()
+        )
 
     def get_all_descendants(self):
         children = self.children()
@@ -239,6 +358,7 @@ class CustomWidget(QtWidgets.QFrame):
 
         if self.layout() is None:
             self.setLayout(layout_wdg)
+        self._sync_constraints()
 
     def clear_constraints(self):
         layout = self.layout()
@@ -250,59 +370,90 @@ class CustomWidget(QtWidgets.QFrame):
                     layout.removeWidget(widget_to_remove)  # Remove from layout
                     widget_to_remove.setParent(self)
             sip.delete(layout)
-
-
-class CustomTreeWidget(QtWidgets.QTreeWidget):
-    item_deleted = QtCore.pyqtSignal(QtWidgets.QTreeWidgetItem)
-    def __init__(self, parent=None):
-        super(CustomTreeWidget, self).__init__(parent)
-        self.setContextMenuPolicy(QtCore.Qt.CustomContextMenu)
-        self.customContextMenuRequested.connect(self.on_context_menu_requested)
-
-    def delete_component(self, item):
-        parent = item.parent()
-        if parent:
-            parent.removeChild(item)
-        else:
-            self.takeTopLevelItem(self.indexOfTopLevelItem(item))
-        self.item_deleted.emit(item)
-
-    def on_context_menu_requested(self, pos):
-        item = self.itemAt(pos)
-        if item:
-            menu = QtWidgets.QMenu()
-            delete_action = menu.addAction("Delete")
-            action = menu.exec_(self.mapToGlobal(pos))
-            if action == delete_action:
-                self.delete_component(item)
-
-    def keyPressEvent(self, event):
-        super().keyPressEvent(event)
-        if event.key() == QtCore.Qt.Key.Key_Delete and self.currentItem().text(0) != "Canvas":
-            self.delete_component(self.currentItem())
+        self.node.constraints = None
 
 
 class Canvas(CustomWidget):
+    """
+    Root component of a template. The background grid is drawn from a cached
+    tile pixmap used as a brush, so repainting only fills the exposed region.
+    """
+    geometry_changed = QtCore.pyqtSignal(tuple, tuple)
     def __init__(self, *args, **kwargs):
         super(Canvas, self).__init__(*args, **kwargs)
         self.setObjectName("Canvas")
         self.setProperty("component_type", "Canvas")
+        self.node.name = "Canvas"
+        self.node.type = "Canvas"
+
+        self.__grid_spacing = GRID_SPACING
+        self.__grid_visible = True
+        self.__grid_brush = None
+        self.__grid_ratio = None
+
+    def _sync_geometry(self):
+        # The canvas is the page: its position in the window is not part of the template
+        self.node.component.size = [self.width(), self.height()]
+
+    @property
+    def grid_spacing(self):
+        return self.__grid_spacing
+
+    @grid_spacing.setter
+    def grid_spacing(self, spacing):
+        spacing = max(int(spacing), 2)
+        if spacing != self.__grid_spacing:
+            self.__grid_spacing = spacing
+            self.__grid_brush = None
+            self.update()
+
+    @property
+    def grid_visible(self):
+        return self.__grid_visible
+
+    @grid_visible.setter
+    def grid_visible(self, visible):
+        visible = bool(visible)
+        if visible != self.__grid_visible:
+            self.__grid_visible = visible
+            self.__grid_brush = None
+            self.update()
+
+    def __build_grid_brush(self):
+        """
+        Render one grid cell (background plus its top and left lines) into a
+        pixmap; tiled from the widget origin it reproduces the whole grid.
+        """
+        if not self.__grid_visible:
+            return QtGui.QBrush(CANVAS_BACKGROUND_COLOR)
+
+        ratio = self.__grid_ratio
+        spacing = self.__grid_spacing
+        tile = QtGui.QPixmap(int(round(spacing * ratio)), int(round(spacing * ratio)))
+        tile.setDevicePixelRatio(ratio)
+        tile.fill(CANVAS_BACKGROUND_COLOR)
+
+        painter = QtGui.QPainter(tile)
+        painter.setPen(QtGui.QPen(GRID_COLOR, 1, QtCore.Qt.SolidLine))
+        painter.drawLine(0, 0, spacing, 0)
+        painter.drawLine(0, 0, 0, spacing)
+        painter.end()
+        return QtGui.QBrush(tile)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        size = event.size()
+        self.node.component.size = [size.width(), size.height()]
+        self.geometry_changed.emit((0, 0), (size.width(), size.height()))
         
     def paintEvent(self, event):
         super().paintEvent(event)
+        # The tile is rendered for the device pixel ratio of the current screen
+        if self.__grid_brush is None or self.__grid_ratio != self.devicePixelRatioF():
+            self.__grid_ratio = self.devicePixelRatioF()
+            self.__grid_brush = self.__build_grid_brush()
         painter = QtGui.QPainter(self)
-        painter.fillRect(self.rect(), QtGui.QBrush(QtGui.QColor(255, 255, 255)))
-        pen = QtGui.QPen(QtGui.QColor(200, 200, 200), 1, QtCore.Qt.SolidLine)
-        painter.setPen(pen)
-        rect = self.rect()
-
-        lines = []
-        for x in range(0, rect.width(), 24):
-            lines.append(QtCore.QLine(QtCore.QPoint(x, 0), QtCore.QPoint(x, rect.height())))
-        for y in range(0, rect.height(), 24):
-            lines.append(QtCore.QLine(QtCore.QPoint(0, y), QtCore.QPoint(rect.width(), y)))
-
-        painter.drawLines(lines)
+        painter.fillRect(event.rect(), self.__grid_brush)
 
 
 class DragAndDropContainer(CustomWidget):
@@ -329,6 +480,9 @@ class DragAndDropContainer(CustomWidget):
                 background-color: rgba({}, {}, {}, {});
                 border: {}px solid rgba({}, {}, {}, {});
             }}""".format(component_name, *self._style["fill_color"], self._style["line_width"], *self._style["edge_color"]))
+        self.node.name = component_name
+        self.node.type = "Container"
+        self._sync_style()
 
     def paintEvent(self, _):
         painter = QtGui.QPainter(self)
@@ -352,10 +506,12 @@ class DragAndDropContainer(CustomWidget):
 
     def resizeEvent(self, event):
         size = event.size()
+        self.node.component.size = [size.width(), size.height()]
         self.geometry_changed.emit((self.pos().x(), self.pos().y()), (size.width(), size.height()))
 
     def moveEvent(self, event):
         pos = event.pos()
+        self.node.component.pos = [pos.x(), pos.y()]
         self.geometry_changed.emit((pos.x(), pos.y()), (self.rect().width(), self.rect().height()))
 
     def mouseMoveEvent(self, event):
@@ -412,8 +568,18 @@ class DragAndDropContainer(CustomWidget):
                 """.format(self.objectName(), *fill_color, line_width, *edge_color)
             )
 
+        self._sync_style()
         self.update()
 
+    def _sync_style(self):
+        self.node.styles = {
+            "shape": self._style["shape"],
+            "edge_color": ColorArray.rgba2hex(self._style["edge_color"]),
+            "fill_color": ColorArray.rgba2hex(self._style["fill_color"]),
+            "line_width": self._style["line_width"],
+            "radius": self._style["radius"] if self._style["shape"] == "rounded_rect" else 0
+        }
+
 
 class DragAndDropText(DragAndDropContainer):
     def __init__(self, text, *args, **kwargs):
@@ -436,19 +602,9 @@ class DragAndDropText(DragAndDropContainer):
         self.setLayout(layout)
         self.layout().addWidget(self.__label)
 
-    def paintEvent(self, event):
-        super().paintEvent(event)
-        self.__label.setStyleSheet("""
-            border: none;
-            background-color: transparent;
-            font-family: {0};
-            font-size: {1}px;
-            color: rgb({2}, {3}, {4});
-        """.format(
-            self.__text_properties["font"],
-            self.__text_properties["font_size"],
-            *self.__text_properties["font_color"])
-        )
+        self.node.type = "Text"
+        self.__apply_text_style()
+        self._sync_text_properties()
 
     @property
     def text_properties(self):
@@ -462,10 +618,31 @@ class DragAndDropText(DragAndDropContainer):
         va = self.__text_properties["va"].lower()
         self.__label.text_alignment = MAP_LABEL_ALIGNMENT["ha"][ha] | MAP_LABEL_ALIGNMENT["va"][va]
 
+        self.__apply_text_style()
+        self._sync_text_properties()
         self.update()
 
+    def __apply_text_style(self):
+        self.__label.set_text_style(
+            self.__text_properties["font"],
+            self.__text_properties["font_size"],
+            self.__text_properties["font_color"]
+        )
+
+    def _sync_text_properties(self):
+        text_properties = dict(self.__text_properties)
+        text_properties["font_color"] = ColorArray.rgb2hex(text_properties["font_color"])
+        self.node.properties = text_properties
+
 
 class DragAndDropImage(DragAndDropContainer):
+    """
+    Image component. Renditions come from the shared ``pixmap_cache``; missing
+    ones are decoded at display size off the GUI thread while a placeholder is
+    shown. While the component is being resized the last rendition is scaled
+    with a fast transformation, and the exact size is requested once the size
+    settles.
+    """
     def __init__(self, path, *args, **kwargs):
         super(DragAndDropImage, self).__init__(*args, **kwargs)
         self.__image_properties = {
@@ -475,7 +652,6 @@ class DragAndDropImage(DragAndDropContainer):
             "ha": "center",
             "va": "center"
         }
-        self.pixmap = QtGui.QPixmap(path)
         self.__label = QtWidgets.QLabel()
         self.__label.setStyleSheet("border: none; background-color: transparent;")
         self.__label.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
@@ -486,20 +662,77 @@ class DragAndDropImage(DragAndDropContainer):
         self.setLayout(layout)
         self.layout().addWidget(self.__label)
 
-        self.__label.setPixmap(
-            self.pixmap.scaled(
-                self.__label.size(), 
-                self.__image_properties["keep_aspect_ratio"], 
-                QtCore.Qt.SmoothTransformation
-            )
-        )
+        self.__settle_timer = QtCore.QTimer(self)
+        self.__settle_timer.setSingleShot(True)
+        self.__settle_timer.setInterval(IMAGE_SETTLE_MS)
+        self.__settle_timer.timeout.connect(lambda: self.__update_pixmap(smooth=True))
+
+        self.__token = None
+        self.__rendition = QtGui.QPixmap()
+        self.__update_pixmap(smooth=True)
+
+        self.node.type = "Image"
+        self.node.properties = dict(self.__image_properties)
+
+    @property
+    def pixmap(self):
+        return pixmap_cache.original(self.__image_properties["path"])
 
     def resizeEvent(self, event):
         super().resizeEvent(event)
-        scaled_pixmap = self.pixmap.scaled(
-            self.__label.size(), self.__image_properties["keep_aspect_ratio"], QtCore.Qt.SmoothTransformation
+        self.__update_pixmap(smooth=False)
+        self.__settle_timer.start()
+
+    def __update_pixmap(self, smooth):
+        path = self.__image_properties["path"]
+        scale = self.__image_properties["scale"]
+        keep_aspect_ratio = self.__image_properties["keep_aspect_ratio"]
+        size = self.__label.size()
+
+        if not smooth:
+            if not self.__rendition.isNull():
+                self.__label.setPixmap(PixmapCache.scale(self.__rendition, size, scale, keep_aspect_ratio, smooth=False))
+            return
+
+        image_loader().cancel(self.__token)
+        self.__token = None
+        key = pixmap_cache.rendition_key(path, size, scale, keep_aspect_ratio) if path != "" else None
+        if key is None:
+            self.__rendition = QtGui.QPixmap()
+            self.__label.clear()
+            return
+
+        if is_svg(path):
+            # Vector documents are rasterized at the exact label size; after the
+            # first parse this is a cheap paint, so it stays on the GUI thread
+            self.__set_rendition(svg_rasterizer.rendition(path, size, scale, keep_aspect_ratio))
+            return
+
+        pixmap = pixmap_cache.get(key)
+        if pixmap is not None:
+            self.__set_rendition(pixmap)
+            return
+
+        if self.__rendition.isNull():
+            self.__label.setText(IMAGE_PLACEHOLDER_TEXT)
+        self.__token = image_loader().request(
+            key, path, size, scale, keep_aspect_ratio,
+            owner=self, callback=self.__on_image_loaded
         )
-        self.__label.setPixmap(scaled_pixmap)
+
+    def __set_rendition(self, pixmap):
+        self.__rendition = pixmap
+        if pixmap.isNull():
+            self.__label.clear()
+        else:
+            self.__label.setPixmap(pixmap)
+
+    def __on_image_loaded(self, token, pixmap):
+        # Results of canceled requests are never delivered; this only guards reentrancy
+        if token != self.__token:
+            return
+        self.__token = None
+        self.__set_rendition(pixmap)
 
     @property
     def image_properties(self):
@@ -507,37 +740,17 @@ class DragAndDropImage(DragAndDropContainer):
 
     @image_properties.setter
     def image_properties(self, dict_image_properties):
+        if dict_image_properties.get("path", self.__image_properties["path"]) != self.__image_properties["path"]:
+            # The previous image must not stand in for the new one while it loads
+            self.__rendition = QtGui.QPixmap()
         self.__image_properties.update(dict_image_properties)
         self.__label.setAlignment(
             MAP_LABEL_ALIGNMENT["ha"][self.__image_properties["ha"].lower()] | 
             MAP_LABEL_ALIGNMENT["va"][self.__image_properties["va"].lower()]
         )
-        if self.__image_properties["path"] == "":
-            self.__label.clear()
-        else:
-            self.pixmap = QtGui.QPixmap(self.__image_properties["path"])
-            if self.__image_properties["scale"] == "fit":
-                self.__label.setPixmap(
-                    self.pixmap.scaled(
-                        self.__label.size(), 
-                        self.__image_properties["keep_aspect_ratio"], 
-                        QtCore.Qt.SmoothTransformation
-                    )
-                )
-            elif self.__image_properties["scale"] == "width":
-                self.__label.setPixmap(
-                    self.pixmap.scaledToWidth(
-                        self.__label.size().width(), 
-                        QtCore.Qt.SmoothTransformation
-                    )
-                )
-            else:
-                self.__label.setPixmap(
-                    self.pixmap.scaledToHeight(
-                        self.__label.size().height(), 
-                        QtCore.Qt.SmoothTransformation
-                    )
-                )
+        self.__settle_timer.stop()
+        self.__update_pixmap(smooth=True)
+        self.node.properties = dict(self.__image_properties)
         self.update()
 
 class DragAndDropButton(DragAndDropContainer):
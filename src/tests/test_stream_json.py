@@ -0,0 +1,80 @@
+import json
+import random
+import unittest
+
+from app.utils.stream_json import NodeStreamParser
+
+
+def template(seed):
+    rng = random.Random(seed)
+    children = []
+    for index in range(rng.randint(1, 5)):
+        children.append({
+            "name": "container_{}".format(index),
+            "type": "container",
+            "component": {
+                "pos": [rng.randint(-500, 500), rng.uniform(-1000, 1000)],
+                "size": [rng.randint(1, 1000), rng.random() * 1e-5],
+                "size_policy": ["fixed", "preferred"]
+            },
+            "styles": {"radius": -rng.uniform(0, 1e10), "visible": rng.random() < .5, "edge": None},
+            "children": [
+                {
+                    "name": "text_{}".format(index),
+                    "type": "text",
+                    "properties": {"text": "Lorem \"ipsum\" \\ {}".format(rng.random()), "font_size": 12.5}
+                }
+            ]
+        })
+    return {"name": "canvas", "type": "canvas", "component": {"pos": [0, 0]}, "children": children}
+
+
+def preorder(node, parent=None, nodes=None):
+    nodes = [] if nodes is None else nodes
+    nodes.append((parent, {key: value for key, value in node.items() if key != "children"}))
+    index = len(nodes) - 1
+    for child in node.get("children", ()):
+        preorder(child, index, nodes)
+    return nodes
+
+
+def feed(text, sizes):
+    parser = NodeStreamParser()
+    events = []
+    position = 0
+    while position < len(text):
+        size = next(sizes)
+        events.extend(parser.feed(text[position:position + size]))
+        position += size
+    return parser, events
+
+
+class NodeStreamParserTest(unittest.TestCase):
+
+    def assert_parsed(self, data, text, sizes):
+        parser, events = feed(text, sizes)
+        self.assertTrue(parser.done)
+        self.assertTrue(parser.complete)
+        self.assertEqual(parser.result(), data)
+        self.assertEqual([(parent, node) for _, parent, node in events], preorder(data))
+
+    def test_random_chunks(self):
+        for seed in range(300):
+            data = template(seed)
+            text = "```json\n{}\n```".format(json.dumps(data, indent=4 if seed % 2 else None))
+            rng = random.Random(seed)
+            self.assert_parsed(data, text, iter(lambda: rng.randint(1, 64), None))
+
+    def test_numbers_split_across_chunks(self):
+        for value in (-5, 12.5, 1.5e30, -0.25e-3, 0, -10):
+            data = {"name": "canvas", "component": {"pos": [value, 1]}}
+            text = json.dumps(data)
+            for split in range(1, len(text)):
+                parser = NodeStreamParser()
+                parser.feed(text[:split])
+                parser.feed(text[split:])
+                self.assertEqual(parser.result(), data, text[:split])
+
+
+if __name__ == "__main__":
+    unittest.main()
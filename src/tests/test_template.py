@@ -0,0 +1,45 @@
+import unittest
+
+from app.models.template import TemplateDocument, TemplateNode
+
+
+class TemplateNodeRowTest(unittest.TestCase):
+
+    def assert_rows(self, parent):
+        self.assertEqual([child.row() for child in parent.children], list(range(len(parent.children))))
+
+    def test_rows_follow_insertions_and_removals(self):
+        document = TemplateDocument()
+        root = document.root
+        nodes = [TemplateNode(name="node_{}".format(i), type="Container") for i in range(10)]
+        for node in nodes:
+            root.append(node)
+        self.assert_rows(root)
+
+        nodes[0].detach()
+        nodes[5].detach()
+        nodes[9].detach()
+        self.assert_rows(root)
+        self.assertEqual(nodes[5].row(), 0)
+
+        nodes[3].append(nodes[4])
+        self.assert_rows(root)
+        self.assert_rows(nodes[3])
+        root.append(nodes[5])
+        self.assert_rows(root)
+
+    def test_rows_of_loaded_template(self):
+        document = TemplateDocument.from_dict({
+            "name": "canvas",
+            "type": "canvas",
+            "children": [
+                {"name": "container_{}".format(i), "type": "container", "children": [{"name": "text", "type": "text"}]}
+                for i in range(5)
+            ]
+        })
+        for node in document:
+            self.assert_rows(node)
+
+
+if __name__ == "__main__":
+    unittest.main()
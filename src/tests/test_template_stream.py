@@ -0,0 +1,110 @@
+import json
+import unittest
+
+from app.io.template_stream import TemplateStream
+from app.models.template import TemplateDocument
+
+
+DESIGN = {
+    "name": "Canvas",
+    "type": "Canvas",
+    "component": {"pos": [0, 0], "size": [1000, 1000], "size_policy": ["fixed", "fixed"]},
+    "children": [{"name": "Text", "type": "Text", "properties": {"text": "Mine"}}]
+}
+
+GENERATED = {
+    "name": "canvas",
+    "type": "canvas",
+    "children": [
+        {"name": "container_0", "type": "container", "children": [{"name": "text_0", "type": "text"}]},
+        {"name": "image_0", "type": "image"}
+    ]
+}
+
+
+class FakeCanvas(object):
+    """
+    Stands in for the designer window: the design is a list of (name, parent name).
+    """
+
+    def __init__(self):
+        self.nodes = self.flatten(DESIGN)
+        self.restored = 0
+
+    @staticmethod
+    def flatten(data):
+        nodes = []
+        stack = [(TemplateDocument.from_dict(data).root, None)]
+        while stack:
+            node, parent = stack.pop()
+            nodes.append((node.name, parent))
+            stack.extend((child, node.name) for child in reversed(node.children))
+        return nodes
+
+    def snapshot(self):
+        return json.loads(json.dumps(DESIGN)) if self.nodes == self.flatten(DESIGN) else None
+
+    def replace(self):
+        self.nodes = []
+
+    def build_node(self, node, context):
+        self.nodes.append((node.name, context))
+        return node.name
+
+    def restore(self, data):
+        self.restored += 1
+        self.nodes = self.flatten(data)
+
+    def stream(self):
+        return TemplateStream(self.snapshot, self.replace, self.build_node, self.restore)
+
+
+def chunks(text, size=7):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class TemplateStreamTest(unittest.TestCase):
+
+    def test_complete_template_replaces_design(self):
+        canvas = FakeCanvas()
+        stream = canvas.stream()
+        for chunk in chunks("```json\n{}\n```".format(json.dumps(GENERATED))):
+            stream.feed(chunk)
+        self.assertTrue(stream.finish())
+        self.assertEqual(canvas.nodes, FakeCanvas.flatten(GENERATED))
+        self.assertEqual(stream.built, 4)
+
+    def test_text_without_template_leaves_design(self):
+        canvas = FakeCanvas()
+        stream = canvas.stream()
+        for chunk in chunks("I cannot generate that template, sorry."):
+            stream.feed(chunk)
+        self.assertFalse(stream.started)
+        self.assertFalse(stream.finish())
+        self.assertEqual(canvas.nodes, FakeCanvas.flatten(DESIGN))
+        self.assertEqual(canvas.restored, 0)
+
+    def test_failed_request_restores_design(self):
+        canvas = FakeCanvas()
+        stream = canvas.stream()
+        text = json.dumps(GENERATED)
+        for chunk in chunks(text[:len(text) // 2]):
+            stream.feed(chunk)
+        self.assertTrue(stream.started)
+        self.assertNotEqual(canvas.nodes, FakeCanvas.flatten(DESIGN))
+        stream.abort()
+        self.assertEqual(canvas.nodes, FakeCanvas.flatten(DESIGN))
+
+    def test_truncated_or_invalid_response_restores_design(self):
+        for text in (json.dumps(GENERATED)[:-10], json.dumps(GENERATED)[:60] + "}}}] oops {"):
+            canvas = FakeCanvas()
+            stream = canvas.stream()
+            for chunk in chunks(text):
+                stream.feed(chunk)
+            self.assertFalse(stream.finish())
+            self.assertEqual(canvas.nodes, FakeCanvas.flatten(DESIGN))
+            self.assertEqual(canvas.restored, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()